@@ -1,4 +1,14 @@
 from .pyprof import *
 from .prof_proxy import *
+from .statistics import *
+from .sketch import *
+from .snapshot import *
+from .executor import *
+from .reporter import *
+from .trace import *
+from .timeline import *
+from .export import *
+from .server import *
+from .instrument import *
 
 __version__ = "0.0.7"
@@ -0,0 +1,112 @@
+import tracemalloc
+from threading import Lock, local
+from typing import Dict, List, Optional, Set, Tuple
+from weakref import ref
+
+# whether the peak of traced memory can be reset (Python 3.9+), without which the peak of a span is its net
+PEAK_AVAILABLE = hasattr(tracemalloc, "reset_peak")
+
+
+class _OpenSpans:
+    """
+    The open spans of a thread
+    """
+    __slots__ = ("peaks", "__weakref__")
+
+    def __init__(self):
+        # the highest traced memory seen so far by each open span (by tic id), in a one-item list,
+        # so that the other threads can raise it without adding or removing spans
+        self.peaks: Dict[int, List[int]] = {}
+
+
+_local = local()
+# weak references to the open spans of all the live threads, which are discarded when a thread ends
+_all_open_spans: Set["ref[_OpenSpans]"] = set()
+# guards only the registration of the open spans of a new thread
+_register_lock = Lock()
+# the number of open spans of all threads, and whether tracemalloc was started by `tic`,
+# so that it is stopped once the last of them is closed
+_open_count = 0
+_started_tracing = False
+# guards the two above, and starting or stopping tracemalloc
+_tracing_lock = Lock()
+
+
+def _open_peaks() -> Dict[int, List[int]]:
+    """
+    :return: the peaks of the open spans of the current thread
+    """
+    try:
+        return _local.open_spans.peaks
+    except AttributeError:
+        open_spans = _local.open_spans = _OpenSpans()
+        with _register_lock:
+            _all_open_spans.add(ref(open_spans, _all_open_spans.discard))
+        return open_spans.peaks
+
+
+def _fold_peak() -> int:
+    """
+    Fold the peak of traced memory since the last tic or toc of any thread into all the open spans,
+    and start a new segment
+    :return: the current traced memory
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    if PEAK_AVAILABLE:
+        tracemalloc.reset_peak()
+        for open_spans_ref in list(_all_open_spans):
+            open_spans = open_spans_ref()
+            if open_spans is None:
+                continue
+            for open_peak in list(open_spans.peaks.values()):
+                if peak > open_peak[0]:
+                    open_peak[0] = peak
+    return current
+
+
+def tic(tic_id: int) -> int:
+    """
+    Open a span of memory tracking, and start tracemalloc if not tracing yet.
+    The traced memory is process-wide, so the allocations of other threads running meanwhile are included.
+    :param tic_id:
+    :return: the traced memory at tic
+    """
+    global _open_count, _started_tracing
+    with _tracing_lock:
+        _open_count += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+    current = _fold_peak()
+    _open_peaks()[tic_id] = [current]
+    return current
+
+
+def toc(tic_id: int, start: int) -> Optional[Tuple[int, int]]:
+    """
+    Close a span opened by `tic`, and stop tracemalloc if it was started by `tic` and no span is open any more
+    :param tic_id:
+    :param start: the traced memory at tic
+    :return: the net and the peak allocated bytes since tic, or None if tracemalloc was stopped meanwhile
+    """
+    open_peaks = _open_peaks()
+    if not tracemalloc.is_tracing():
+        open_peaks.pop(tic_id, None)
+        _close()
+        return None
+    current = _fold_peak()
+    peak = open_peaks.pop(tic_id, [current])[0]
+    _close()
+    return current - start, max(peak, current) - start
+
+
+def _close():
+    global _open_count, _started_tracing
+    with _tracing_lock:
+        _open_count -= 1
+        if _open_count == 0 and _started_tracing:
+            _started_tracing = False
+            tracemalloc.stop()
+
+
+__all__ = []
@@ -0,0 +1,434 @@
+"""
+Benchmarks of the overhead of pyprof, which emit JSON results comparable between versions:
+
+    python -m pyprof.benchmark --output new.json
+    python -m pyprof.benchmark --baseline old.json
+
+All the Profilers are cleaned before and after running.
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics as stats
+import sys
+import time
+import tracemalloc
+from threading import Barrier, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from . import monitoring
+from .prof_proxy import ProfilerProxy, profile
+from .pyprof import Profiler, clean, report, enable, disable, is_enabled
+from .statistics import SampleStatistics, StreamingStatistics
+
+
+def _result(name: str, params: Dict[str, Any], samples: Sequence[float], unit: str = "s") -> Dict[str, Any]:
+    """
+    :param samples: the measurement of each repeat
+    :return: `value` is the min of the repeats, which is the least disturbed by the rest of the system
+    """
+    return {
+        "name": name,
+        "params": params,
+        "unit": unit,
+        "value": min(samples),
+        "median": stats.median(samples),
+        "repeats": list(samples),
+    }
+
+
+def _repeat(func: Callable[[], float], repeat: int) -> List[float]:
+    gc.collect()
+    return [func() for _ in range(repeat)]
+
+
+def _time_per_call(func: Callable[[], Any], n: int) -> float:
+    tic = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - tic) / n
+
+
+def _new_function(name: str) -> Callable[[], None]:
+    """
+    :return: an empty function with a code object of its own, which is not nested,
+        so that sys.monitoring can register it (a def in a loop shares one code object)
+    """
+    namespace: Dict[str, Any] = {}
+    exec(f"def {name}():\n    pass\n", namespace)
+    return namespace[name]
+
+
+def bench_decorator(n: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    The extra time per call of a function decorated by `profile`, by each available backend
+    """
+    def plain():
+        pass
+
+    plain_time = min(_repeat(lambda: _time_per_call(plain, n), repeat))
+    ret = []
+    use_monitoring = ProfilerProxy.use_monitoring
+    for backend in ("wrapper", "monitoring") if monitoring.AVAILABLE else ("wrapper",):
+        decorated = _new_function(f"decorated_{backend}")
+        ProfilerProxy.use_monitoring = backend == "monitoring"
+        try:
+            decorated = profile(f"decorator-{backend}")(decorated)
+            ret.append(_result(
+                "decorator", {"backend": backend},
+                [_ - plain_time for _ in _repeat(lambda: _time_per_call(decorated, n), repeat)],
+            ))
+        finally:
+            ProfilerProxy.use_monitoring = use_monitoring
+            monitoring.unregister(decorated)
+    return ret
+
+
+def bench_context_manager(n: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    The time per `with profile(name):` block, including the creation of the ProfilerProxy
+    """
+    def block():
+        with profile("context-manager"):
+            pass
+
+    return [_result("context_manager", {}, _repeat(lambda: _time_per_call(block, n), repeat))]
+
+
+def bench_disabled(n: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    The extra time per call of a function decorated by `profile` (by each available backend),
+    and per block of an inline `with profile(name):` and of a reused `profile` context manager,
+    while profiling is globally disabled
+    """
+    def plain():
+        pass
+
+    proxy = profile("disabled-context-manager")
+
+    def block():
+        with proxy:
+            pass
+
+    def inline_block():
+        with profile("disabled-inline"):
+            pass
+
+    enabled = is_enabled()
+    use_monitoring = ProfilerProxy.use_monitoring
+    disable()
+    try:
+        plain_time = min(_repeat(lambda: _time_per_call(plain, n), repeat))
+        ret = []
+        for backend in ("wrapper", "monitoring") if monitoring.AVAILABLE else ("wrapper",):
+            ProfilerProxy.use_monitoring = backend == "monitoring"
+            decorated = profile(f"disabled-{backend}")(_new_function(f"disabled_{backend}"))
+            ProfilerProxy.use_monitoring = use_monitoring
+            ret.append(_result(
+                "disabled", {"mode": "decorator", "backend": backend},
+                [_ - plain_time for _ in _repeat(lambda: _time_per_call(decorated, n), repeat)],
+            ))
+            monitoring.unregister(decorated)
+        for form, func in (("inline", inline_block), ("reused", block)):
+            ret.append(_result(
+                "disabled", {"mode": "context_manager", "form": form},
+                [_ - plain_time for _ in _repeat(lambda: _time_per_call(func, n), repeat)],
+            ))
+    finally:
+        ProfilerProxy.use_monitoring = use_monitoring
+        if enabled:
+            enable()
+    return ret
+
+
+def bench_tic_toc(n: int, repeat: int, depths: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    The time per tic-toc-pair of a Profiler at each depth of the tree,
+    while its ancestors are in tic (`active`), or not, so that the pairs are also counted in them (`idle`)
+    """
+    ret = []
+    for depth in depths:
+        for parents in ("active", "idle"):
+            ancestors = []
+            profiler = None
+            for level in range(depth):
+                if profiler is not None:
+                    ancestors.append(profiler)
+                profiler = Profiler(f"tic-toc-{parents}-{level}", profiler)
+
+            def pairs():
+                for _ in ancestors if parents == "active" else ():
+                    _.tic()
+                elapsed_time = _time_per_call(lambda: (profiler.tic(), profiler.toc()), n)
+                for _ in reversed(ancestors) if parents == "active" else ():
+                    _.toc()
+                return elapsed_time
+
+            ret.append(_result("tic_toc", {"depth": depth, "parents": parents}, _repeat(pairs, repeat)))
+            # so that the pulling of the pairs in the ancestors is included
+            profiler.count
+    return ret
+
+
+def bench_threads(n: int, repeat: int, thread_counts: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    The wall time per tic-toc-pair when several threads record into the same Profiler concurrently,
+    each of them recording n pairs
+    """
+    ret = []
+    for n_threads in thread_counts:
+        profiler = Profiler(f"threads-{n_threads}")
+
+        def work(barrier: Barrier):
+            barrier.wait()
+            for _ in range(n):
+                profiler.tic()
+                profiler.toc()
+
+        def pairs():
+            barrier = Barrier(n_threads + 1)
+            threads = [Thread(target=work, args=(barrier,)) for _ in range(n_threads)]
+            for _ in threads:
+                _.start()
+            barrier.wait()
+            tic = time.perf_counter()
+            for _ in threads:
+                _.join()
+            return (time.perf_counter() - tic) / (n * n_threads)
+
+        ret.append(_result("threads", {"threads": n_threads}, _repeat(pairs, repeat)))
+    return ret
+
+
+def bench_samples(n: int, repeat: int, sample_counts: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    The time per tic-toc-pair, including the merging of the buffers, of a Profiler already holding many samples
+    """
+    ret = []
+    for streaming in (False, True):
+        for sample_count in sample_counts:
+            profiler = Profiler(f"samples-{streaming}-{sample_count}", streaming=streaming)
+            existing = (StreamingStatistics if streaming else SampleStatistics)(0.01)
+            existing.extend([1e-6] * sample_count)
+            # noinspection PyProtectedMember
+            profiler._merge_statistics(existing)
+
+            def pairs():
+                tic = time.perf_counter()
+                for _ in range(n):
+                    profiler.tic()
+                    profiler.toc()
+                profiler.count  # merge the buffers
+                return (time.perf_counter() - tic) / n
+
+            ret.append(_result(
+                "samples", {"samples": sample_count, "streaming": streaming}, _repeat(pairs, repeat),
+            ))
+    return ret
+
+
+def _build_tree(n_nodes: int, branching: int = 10):
+    """
+    Create Profilers of n_nodes (besides the root) level by level, and record one pair in each of them
+    """
+    level = [None]
+    n_created = 0
+    while n_created < n_nodes:
+        next_level = []
+        for parent in level:
+            for i in range(min(branching, n_nodes - n_created)):
+                profiler = Profiler(f"node-{i}", parent)
+                profiler.tic()
+                profiler.toc()
+                next_level.append(profiler)
+                n_created += 1
+        level = next_level
+    return level[-1]
+
+
+def bench_report(repeat: int, node_counts: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    The latency of `report()` of the whole tree, from scratch (`full`),
+    and after only one Profiler records a pair since the last report (`incremental`)
+    """
+    ret = []
+    for n_nodes in node_counts:
+        full_times = []
+        incremental_times = []
+        for _ in range(repeat):
+            clean()
+            leaf = _build_tree(n_nodes)
+            tic = time.perf_counter()
+            report()
+            full_times.append(time.perf_counter() - tic)
+            leaf.tic()
+            leaf.toc()
+            tic = time.perf_counter()
+            report()
+            incremental_times.append(time.perf_counter() - tic)
+        ret.append(_result("report", {"nodes": n_nodes, "mode": "full"}, full_times))
+        ret.append(_result("report", {"nodes": n_nodes, "mode": "incremental"}, incremental_times))
+    clean()
+    return ret
+
+
+def bench_memory(n: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    The memory allocated per million tic-toc-pairs kept by a Profiler, in bytes
+    """
+    ret = []
+    for streaming in (False, True):
+        def allocated():
+            profiler = Profiler(f"memory-{streaming}", flush=True, streaming=streaming)
+            gc.collect()
+            # the caller may be tracing already
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                for _ in range(n):
+                    profiler.tic()
+                    profiler.toc()
+                profiler.count  # merge the buffers
+                after = tracemalloc.get_traced_memory()[0]
+            finally:
+                if started:
+                    tracemalloc.stop()
+            return (after - before) * 1e6 / n
+
+        ret.append(_result("memory", {"streaming": streaming}, _repeat(allocated, repeat), unit="B"))
+    return ret
+
+
+BENCHMARKS = ("decorator", "context_manager", "disabled", "tic_toc", "threads", "samples", "report", "memory")
+
+
+def run_benchmarks(
+        quick: bool = False, only: Optional[Iterable[str]] = None, repeat: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    :param quick: fewer iterations and smaller sizes, e.g., for smoke tests
+    :param only: the names of the benchmarks to run (see `BENCHMARKS`), all by default
+    :param repeat: the number of repeats of each measurement
+    :return: the environment and a list of results, each of which has
+        the benchmark name, its params, the unit (`s` or `B`), the `value` (min of the repeats), the median
+        and the repeats
+    """
+    from . import __version__
+    only = set(BENCHMARKS if only is None else only)
+    unknown = only - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"unknown benchmarks: {sorted(unknown)}")
+    if repeat is None:
+        repeat = 3 if quick else 5
+    n = 2000 if quick else 100000
+    results = []
+    clean()
+    try:
+        if "decorator" in only:
+            results += bench_decorator(n, repeat)
+        if "context_manager" in only:
+            results += bench_context_manager(n, repeat)
+        if "disabled" in only:
+            results += bench_disabled(n, repeat)
+        if "tic_toc" in only:
+            results += bench_tic_toc(n, repeat, (1, 10) if quick else (1, 10, 100))
+        if "threads" in only:
+            results += bench_threads(n // 10, repeat, (1, 4) if quick else (1, 4, 16))
+        if "samples" in only:
+            results += bench_samples(n, repeat, (0, 10000) if quick else (0, 100000, 1000000))
+        if "report" in only:
+            results += bench_report(repeat, (100, 1000) if quick else (100, 1000, 10000))
+        if "memory" in only:
+            # the allocations hardly vary, and tracemalloc slows down recording by an order of magnitude
+            results += bench_memory(n // 2, 1)
+    finally:
+        clean()
+    return {
+        "pyprof": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "quick": quick,
+        "results": results,
+    }
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f'{result["name"]}{json.dumps(result["params"], sort_keys=True)}'
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Compare the results present in both runs of `run_benchmarks`
+    :param baseline:
+    :param current:
+    :param threshold: a result is a regression if it is more than (1 + threshold) times the baseline
+    :return: the key (name and params), baseline value, current value, ratio and whether it is a regression
+        of each result
+    """
+    baseline_values = {_key(_): _["value"] for _ in baseline["results"]}
+    ret = []
+    for result in current["results"]:
+        key = _key(result)
+        if key not in baseline_values:
+            continue
+        base, value = baseline_values[key], result["value"]
+        ratio = value / base if base > 0 else float("inf") if value > 0 else 1.
+        ret.append({
+            "key": key,
+            "baseline": base,
+            "current": value,
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return ret
+
+
+def _format_value(value: float, unit: str) -> str:
+    if unit == "s":
+        return f"{value * 1e6:10.3f}us"
+    return f"{value / 2 ** 20:10.3f}MiB"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m pyprof.benchmark", description="Benchmark pyprof overhead")
+    parser.add_argument("--output", "-o", help="write the JSON results to this file")
+    parser.add_argument("--baseline", "-b", help="compare with the JSON results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="the relative slowdown of a regression")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller sizes")
+    parser.add_argument("--repeat", type=int, help="the number of repeats of each measurement")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="the benchmarks to run")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(quick=args.quick, only=args.only, repeat=args.repeat)
+    for result in results["results"]:
+        params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+        print(f'{result["name"]:16}{params:32}{_format_value(result["value"], result["unit"])}', file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = 0
+        for row in compare(baseline, results, args.threshold):
+            regressions += row["regression"]
+            print(
+                f'{row["key"]:56}{row["ratio"]:8.2f}x{" REGRESSION" if row["regression"] else ""}',
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+__all__ = ["run_benchmarks", "compare", "BENCHMARKS"]
+
+if __name__ == "__main__":
+    sys.exit(main())
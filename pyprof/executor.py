@@ -0,0 +1,107 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from functools import wraps
+from typing import Callable, List, Optional
+
+from .prof_proxy import ProfilerProxy, current_profiler
+from .pyprof import Profiler, clean
+from .snapshot import snapshot, merge_snapshot
+
+
+def propagate_profiler(func: Callable) -> Callable:
+    """
+    Bind a function to the current profiler stack,
+    so that Profilers in it are children of the current Profiler in whichever thread it runs.
+    Recording in the worker thread stays lock-free, since only the stack of the caller is captured.
+    :param func:
+    :return:
+    """
+    stack = ProfilerProxy.active_proxy.get()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = ProfilerProxy.active_proxy.set(stack)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            ProfilerProxy.active_proxy.reset(token)
+
+    return wrapper
+
+
+class _ProcessCall:
+    """
+    A picklable function call, which runs under the Profiler of the same path in a worker process.
+    It returns the result together with a snapshot of the Profilers recorded during the call.
+    """
+
+    def __init__(self, func: Callable, parent: Optional[Profiler]):
+        self.func = func
+        self.parent_names: List[str] = []
+        while parent is not None and parent.full_path != "":
+            self.parent_names.insert(0, parent.name)
+            # noinspection PyProtectedMember
+            parent = parent._parent
+
+    def __call__(self, *args, **kwargs):
+        clean()
+        parent = None
+        for name in self.parent_names:
+            parent = Profiler(name, parent)
+        if parent is None:
+            return self.func(*args, **kwargs), snapshot()
+        # the parent is in tic in the submitting process
+        # noinspection PyProtectedMember
+        tic_id = next(Profiler._tic_ids)
+        # noinspection PyProtectedMember
+        parent._active.add(tic_id)
+        token = ProfilerProxy.active_proxy.set(((None, parent),))
+        try:
+            ret = self.func(*args, **kwargs)
+        finally:
+            ProfilerProxy.active_proxy.reset(token)
+            # noinspection PyProtectedMember
+            parent._active.discard(tic_id)
+        return ret, snapshot()
+
+
+class ProfiledThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    A ThreadPoolExecutor whose tasks run under the Profiler current at submit time
+    """
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return super().submit(propagate_profiler(fn), *args, **kwargs)
+
+
+class ProfiledProcessPoolExecutor(ProcessPoolExecutor):
+    """
+    A ProcessPoolExecutor whose tasks run under a Profiler with the same path as the one current at submit time.
+    The Profilers recorded by each task in a worker process are shipped back as a snapshot,
+    which is merged into the Profiler tree of this process when the task completes.
+    """
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        inner = super().submit(_ProcessCall(fn, current_profiler()), *args, **kwargs)
+        future = Future()
+
+        def merge(_):
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                ret, profiler_snapshot = inner.result()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                # the task succeeded, even if its Profilers cannot be merged
+                try:
+                    merge_snapshot(profiler_snapshot)
+                except ValueError as e:
+                    warnings.warn(f"Profilers of a worker process not merged: {e}")
+                future.set_result(ret)
+
+        inner.add_done_callback(merge)
+        return future
+
+
+__all__ = ["propagate_profiler", "ProfiledThreadPoolExecutor", "ProfiledProcessPoolExecutor"]
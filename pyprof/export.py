@@ -0,0 +1,177 @@
+import csv
+import json
+from io import StringIO
+from typing import Any, Dict, Iterator, Sequence
+
+from .pyprof import Profiler
+
+_STATISTICS = ("count", "total", "mean", "std", "min", "max")
+
+
+def _percentile_name(percentile: float) -> str:
+    return f"p{percentile:g}"
+
+
+def _rows(
+        min_total_percent: float, min_parent_percent: float, percentiles: Sequence[float],
+) -> Iterator[Dict[str, Any]]:
+    """
+    Walk the Profiler tree once in the order of `report()`
+    :return: the statistics of each Profiler passing the filters
+    """
+    root = Profiler.get("")
+    names = [_percentile_name(_) for _ in percentiles]
+    # the totals of the Profilers visited, which are visited before their children
+    totals: Dict[str, float] = {}
+    root_total = None
+    # noinspection PyProtectedMember
+    for profiler in root._subtree_profilers():
+        # noinspection PyProtectedMember
+        statistics = profiler._statistics
+        untimed_count = profiler.untimed_count
+        count = statistics.count + untimed_count
+        total = statistics.total if untimed_count == 0 else statistics.average * count
+        totals[profiler.full_path] = total
+        if root_total is None:
+            root_total = total
+        # noinspection PyProtectedMember
+        parent_total = totals.get(profiler._parent.full_path, total) if profiler._parent is not None else total
+        total_percent = total / max(root_total, 1e-4) * 100
+        parent_percent = total / max(parent_total, 1e-4) * 100
+        if total_percent < min_total_percent * 100 or parent_percent < min_parent_percent * 100:
+            continue
+        row = {
+            "path": profiler.full_path,
+            "count": count,
+            "total": total,
+            "mean": statistics.average,
+            "std": statistics.standard_deviation,
+            "min": statistics.min_time,
+            "max": statistics.max_time,
+        }
+        for name, percentile in zip(names, percentiles):
+            row[name] = statistics.tail(percentile)
+        yield row
+
+
+def report_json(
+        min_total_percent: float = 0., min_parent_percent: float = 0., percentiles: Sequence[float] = (50, 90, 99),
+) -> str:
+    """
+    Export the statistics of all Profilers as a JSON list of objects with the keys
+    path, count, total, mean, std, min, max and p50, p90, p99, etc.
+    :param min_total_percent:
+    :param min_parent_percent:
+    :param percentiles: in [0, 100]
+    :return:
+    """
+    return json.dumps(list(_rows(min_total_percent, min_parent_percent, percentiles)))
+
+
+def report_csv(
+        min_total_percent: float = 0., min_parent_percent: float = 0., percentiles: Sequence[float] = (50, 90, 99),
+) -> str:
+    """
+    Export the statistics of all Profilers as CSV with the columns
+    path, count, total, mean, std, min, max and p50, p90, p99, etc.
+    :param min_total_percent:
+    :param min_parent_percent:
+    :param percentiles: in [0, 100]
+    :return:
+    """
+    with StringIO() as ret:
+        writer = csv.DictWriter(
+            ret, fieldnames=["path", *_STATISTICS, *map(_percentile_name, percentiles)], lineterminator="\n",
+        )
+        writer.writeheader()
+        writer.writerows(_rows(min_total_percent, min_parent_percent, percentiles))
+        return ret.getvalue()
+
+
+def self_times() -> Dict[str, float]:
+    """
+    Compute the self time of every Profiler, i.e., its total minus the totals of its children,
+    in a single pass over all Profilers.
+    Children run concurrently in other threads may add up to more than the total of their parent,
+    so the self times are clamped to 0.
+    :return: the self time of each full path
+    """
+    # noinspection PyProtectedMember
+    profilers = Profiler._initialized_instances()
+    totals = {profiler: profiler.total for profiler in profilers}
+    ret = dict(totals)
+    for profiler, total in totals.items():
+        # noinspection PyProtectedMember
+        parent = profiler._parent
+        if parent in ret:
+            ret[parent] -= total
+    return {profiler.full_path: max(self_time, 0.) for profiler, self_time in ret.items()}
+
+
+def report_folded(unit: float = 1e-6) -> str:
+    """
+    Export the Profiler tree in the folded-stacks format of flamegraph.pl and speedscope,
+    i.e., a line of `name;name;name weight` for each Profiler, weighted by its self time.
+    The root Profiler and the Profilers without self time are omitted.
+    :param unit: the time of a weight of 1, in seconds, since the weights are integers
+    :return:
+    """
+    ret = []
+    for full_path, self_time in self_times().items():
+        weight = round(self_time / unit)
+        if full_path and weight > 0:
+            # full paths start with "/"
+            ret.append(f"{';'.join(full_path[1:].replace(';', ':').split('/'))} {weight}\n")
+    return "".join(sorted(ret))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def report_prometheus(
+        min_total_percent: float = 0., min_parent_percent: float = 0., percentiles: Sequence[float] = (50, 90, 99),
+        prefix: str = "pyprof",
+) -> str:
+    """
+    Export the statistics of all Profilers in the Prometheus text exposition format.
+    Each Profiler is a `{prefix}_seconds` summary labelled by its path,
+    with the mean, std, min and max as `{prefix}_seconds_mean`, etc. gauges,
+    and the number of Profilers evicted by `Profiler.max_profilers` is `{prefix}_evicted_profilers_total`.
+    :param min_total_percent:
+    :param min_parent_percent:
+    :param percentiles: in [0, 100]
+    :param prefix:
+    :return:
+    """
+    summary = [
+        f"# HELP {prefix}_seconds The elapsed time of tic-toc-pairs\n",
+        f"# TYPE {prefix}_seconds summary\n",
+    ]
+    # the samples of a metric family are contiguous
+    gauges = {
+        name: [
+            f"# HELP {prefix}_seconds_{name} The {description} elapsed time of tic-toc-pairs\n",
+            f"# TYPE {prefix}_seconds_{name} gauge\n",
+        ] for name, description in [
+            ("mean", "mean"), ("std", "standard deviation of the"), ("min", "min"), ("max", "max"),
+        ]
+    }
+    quantiles = [(_percentile_name(_), f'quantile="{_ / 100:g}"') for _ in percentiles]
+    for row in _rows(min_total_percent, min_parent_percent, percentiles):
+        label = f'path="{_escape_label(row["path"])}"'
+        for name, quantile in quantiles:
+            summary.append(f'{prefix}_seconds{{{label},{quantile}}} {row[name]!r}\n')
+        summary.append(f'{prefix}_seconds_sum{{{label}}} {row["total"]!r}\n')
+        summary.append(f'{prefix}_seconds_count{{{label}}} {row["count"]!r}\n')
+        for name, lines in gauges.items():
+            lines.append(f'{prefix}_seconds_{name}{{{label}}} {row[name]!r}\n')
+    evicted = [
+        f"# HELP {prefix}_evicted_profilers_total The number of Profilers evicted by the cardinality limit\n",
+        f"# TYPE {prefix}_evicted_profilers_total counter\n",
+        f"{prefix}_evicted_profilers_total {Profiler.evicted_count}\n",
+    ]
+    return "".join(summary + [line for lines in gauges.values() for line in lines] + evicted)
+
+
+__all__ = ["report_json", "report_csv", "report_prometheus", "self_times", "report_folded"]
@@ -0,0 +1,181 @@
+import sys
+from fnmatch import fnmatchcase
+from importlib import import_module
+from importlib.abc import Loader, MetaPathFinder
+from types import FunctionType, ModuleType
+from typing import Any, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from . import monitoring
+from .prof_proxy import ProfilerProxy
+
+
+class Instrumentation:
+    """
+    The functions and methods wrapped by `instrument`, which can be restored with `uninstall`
+    """
+
+    def __init__(
+            self, packages: List[str], include: Iterable[str], exclude: Iterable[str],
+            sample_rate: Union[float, Mapping[str, float]],
+    ):
+        self._packages = packages
+        self._include = list(include)
+        self._exclude = list(exclude)
+        self._sample_rate = sample_rate
+        # (owner, attribute name, original value), in the order of patching
+        self._patches: List[Tuple[Any, str, Any]] = []
+        self._visited: Set[int] = set()
+        self._import_hook: Optional[_ImportHook] = None
+
+    def _matches(self, full_name: str) -> bool:
+        return (
+                any(fnmatchcase(full_name, _) for _ in self._include)
+                and not any(fnmatchcase(full_name, _) for _ in self._exclude)
+        )
+
+    def _sample_rate_of(self, full_name: str) -> float:
+        if not isinstance(self._sample_rate, Mapping):
+            return self._sample_rate
+        for pattern, sample_rate in self._sample_rate.items():
+            if fnmatchcase(full_name, pattern):
+                return sample_rate
+        return 1.
+
+    def _covers(self, module_name: str) -> bool:
+        return any(module_name == _ or module_name.startswith(f"{_}.") for _ in self._packages)
+
+    def instrument_module(self, module: ModuleType):
+        """
+        Wrap the matching functions defined in a module, and the methods of the classes defined in it
+        :param module:
+        :return:
+        """
+        for name, value in list(vars(module).items()):
+            self._instrument_attribute(module, module, name, value)
+
+    def _instrument_attribute(self, module: ModuleType, owner: Any, name: str, value: Any):
+        if isinstance(value, type):
+            if value.__module__ != module.__name__ or id(value) in self._visited:
+                return
+            self._visited.add(id(value))
+            for attribute_name, attribute in list(vars(value).items()):
+                self._instrument_attribute(module, value, attribute_name, attribute)
+            return
+        # special methods are called implicitly and often, e.g., __eq__ and __hash__
+        if name.startswith("__") and name.endswith("__"):
+            return
+        func = value.__func__ if isinstance(value, (staticmethod, classmethod)) else value
+        if (
+                not isinstance(func, FunctionType) or func.__module__ != module.__name__
+                or getattr(func, "__pyprof_instrumented__", False)
+        ):
+            return
+        full_name = f"{module.__name__}.{func.__qualname__}"
+        if not self._matches(full_name):
+            return
+        wrapper = ProfilerProxy(func.__qualname__, sample_rate=self._sample_rate_of(full_name))(func)
+        wrapper.__pyprof_instrumented__ = True
+        setattr(owner, name, type(value)(wrapper) if isinstance(value, (staticmethod, classmethod)) else wrapper)
+        self._patches.append((owner, name, value))
+
+    def uninstall(self):
+        """
+        Restore all the wrapped functions and methods, and stop instrumenting newly imported modules
+        :return:
+        """
+        if self._import_hook is not None:
+            if self._import_hook in sys.meta_path:
+                sys.meta_path.remove(self._import_hook)
+            self._import_hook = None
+        while self._patches:
+            owner, name, value = self._patches.pop()
+            setattr(owner, name, value)
+            # the function itself is registered instead of being wrapped if sys.monitoring is used
+            func = value.__func__ if isinstance(value, (staticmethod, classmethod)) else value
+            if monitoring.unregister(func):
+                del func.__pyprof_instrumented__
+        self._visited.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.uninstall()
+
+
+class _InstrumentingLoader(Loader):
+    def __init__(self, loader: Loader, instrumentation: Instrumentation):
+        self._loader = loader
+        self._instrumentation = instrumentation
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType):
+        self._loader.exec_module(module)
+        self._instrumentation.instrument_module(module)
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+
+class _ImportHook(MetaPathFinder):
+    """
+    Instrument the modules of the packages when they are imported
+    """
+
+    def __init__(self, instrumentation: Instrumentation):
+        self._instrumentation = instrumentation
+
+    def find_spec(self, fullname, path, target=None):
+        if not self._instrumentation._covers(fullname):
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _InstrumentingLoader(spec.loader, self._instrumentation)
+        return spec
+
+
+def instrument(
+        target: Union[ModuleType, str], include: Union[str, Iterable[str]] = "*",
+        exclude: Union[str, Iterable[str]] = (), sample_rate: Union[float, Mapping[str, float]] = 1.,
+        import_hook: bool = True,
+) -> Instrumentation:
+    """
+    Profile the functions and methods of a module or a package without decorating them one by one.
+    They are wrapped with `profile` and named by `__qualname__`, so that `report()` shows the tree of calls.
+    Only the references in the modules and classes are replaced,
+    so functions imported elsewhere by `from ... import ...` before instrumenting are not profiled.
+    :param target: a module or a package, or its name
+    :param include: glob patterns of `{module name}.{qualname}` to be profiled
+    :param exclude: glob patterns of `{module name}.{qualname}` not to be profiled
+    :param sample_rate: for every function, or by the first matching glob pattern (1 if none matches)
+    :param import_hook: also instrument the modules of the package imported later, until uninstalled
+    :return: call `uninstall()` to restore
+    """
+    if isinstance(target, str):
+        target = import_module(target)
+    instrumentation = Instrumentation(
+        [target.__name__],
+        [include] if isinstance(include, str) else include,
+        [exclude] if isinstance(exclude, str) else exclude,
+        sample_rate,
+    )
+    for name, module in list(sys.modules.items()):
+        if module is not None and instrumentation._covers(name):
+            instrumentation.instrument_module(module)
+    if import_hook and hasattr(target, "__path__"):
+        # noinspection PyProtectedMember
+        instrumentation._import_hook = _ImportHook(instrumentation)
+        sys.meta_path.insert(0, instrumentation._import_hook)
+    return instrumentation
+
+
+__all__ = ["instrument", "Instrumentation"]
@@ -0,0 +1,138 @@
+import sys
+from inspect import CO_GENERATOR, CO_COROUTINE, CO_ASYNC_GENERATOR, CO_ITERABLE_COROUTINE
+from threading import Lock
+from types import CodeType, FunctionType
+from typing import Any, Callable, Dict, Optional
+
+# whether sys.monitoring is available
+AVAILABLE = sys.version_info >= (3, 12) and hasattr(sys, "monitoring")
+
+# the ProfilerProxy of each registered code object
+_proxies: Dict[CodeType, Any] = {}
+_tool_id: Optional[int] = None
+# whether the events of the registered code objects are turned on, see `set_enabled`
+_enabled = True
+# guards the registration
+_lock = Lock()
+
+
+# the events of each registered code object
+_LOCAL_EVENTS = sys.monitoring.events.PY_START | sys.monitoring.events.PY_RETURN if AVAILABLE else 0
+
+
+def _on_start(code: CodeType, instruction_offset: int):
+    proxy = _proxies.get(code)
+    if proxy is not None:
+        stack = proxy.active_proxy.get()
+        # called by the wrapper of another proxy decorating the same function, which times the call already
+        if stack and getattr(stack[-1][0], "_code", None) is code:
+            return
+        proxy.__enter__()
+
+
+def _on_return(code: CodeType, instruction_offset: int, retval: Any):
+    proxy = _proxies.get(code)
+    if proxy is not None:
+        stack = proxy.active_proxy.get()
+        # the function may have been running when the code object was registered
+        if stack and stack[-1][0] is proxy:
+            proxy.__exit__(None, None, None)
+
+
+def _on_unwind(code: CodeType, instruction_offset: int, exception: BaseException):
+    proxy = _proxies.get(code)
+    if proxy is not None:
+        stack = proxy.active_proxy.get()
+        if stack and stack[-1][0] is proxy:
+            proxy.__exit__(type(exception), exception, exception.__traceback__)
+
+
+def _acquire_tool_id() -> Optional[int]:
+    """
+    Use the first free tool id (e.g., cProfile also uses PROFILER_ID)
+    """
+    global _tool_id
+    if _tool_id is not None:
+        return _tool_id
+    monitoring = sys.monitoring
+    for tool_id in (monitoring.PROFILER_ID, 3, 4):
+        if monitoring.get_tool(tool_id) is None:
+            monitoring.use_tool_id(tool_id, "pyprof")
+            monitoring.register_callback(tool_id, monitoring.events.PY_START, _on_start)
+            monitoring.register_callback(tool_id, monitoring.events.PY_RETURN, _on_return)
+            monitoring.register_callback(tool_id, monitoring.events.PY_UNWIND, _on_unwind)
+            monitoring.set_events(tool_id, monitoring.events.PY_UNWIND)
+            _tool_id = tool_id
+            return tool_id
+    return None
+
+
+def register(func: Callable, proxy) -> bool:
+    """
+    Time every call of a function with a ProfilerProxy by sys.monitoring events (Python 3.12+).
+    The code object is registered for PY_START and PY_RETURN events,
+    so that it is timed without the extra Python frame of a wrapper, and the other code objects pay nothing.
+    PY_UNWIND (i.e., an exception is raised out of a function) can only be monitored globally,
+    so every unwinding frame in the process costs one lookup.
+    Every function of the code object is timed, including the references taken before it is registered.
+    :param func:
+    :param proxy:
+    :return: False if not possible, so that the function should be wrapped instead, i.e., for generators and
+        coroutines, for nested functions and closures (whose code object is shared by every function created from
+        it, e.g., each time the enclosing function runs), for code objects already registered with another proxy,
+        or if sys.monitoring is not available
+    """
+    if not AVAILABLE or not isinstance(func, FunctionType):
+        return False
+    code = func.__code__
+    if code.co_flags & (CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR | CO_ITERABLE_COROUTINE):
+        return False
+    if code.co_freevars or "<locals>" in func.__qualname__:
+        return False
+    with _lock:
+        if code in _proxies:
+            return _proxies[code] is proxy
+        tool_id = _acquire_tool_id()
+        if tool_id is None:
+            return False
+        _proxies[code] = proxy
+        if _enabled:
+            sys.monitoring.set_local_events(tool_id, code, _LOCAL_EVENTS)
+    return True
+
+
+def set_enabled(enabled: bool):
+    """
+    Turn the events of all the registered code objects on or off,
+    so that the registered functions run at full speed while profiling is disabled
+    :param enabled:
+    :return:
+    """
+    global _enabled
+    with _lock:
+        _enabled = enabled
+        if _tool_id is None:
+            return
+        for code in _proxies:
+            sys.monitoring.set_local_events(_tool_id, code, _LOCAL_EVENTS if enabled else 0)
+
+
+def unregister(func: Callable) -> bool:
+    """
+    Stop timing a function registered by `register`
+    :param func:
+    :return: whether it was registered
+    """
+    code = getattr(func, "__code__", None)
+    with _lock:
+        if _proxies.pop(code, None) is None:
+            return False
+        sys.monitoring.set_local_events(_tool_id, code, 0)
+    return True
+
+
+def is_registered(func: Callable) -> bool:
+    return getattr(func, "__code__", None) in _proxies
+
+
+__all__ = []
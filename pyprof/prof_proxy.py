@@ -1,44 +1,151 @@
-from collections import defaultdict
+from contextvars import ContextVar
 from functools import wraps
-from threading import Thread, current_thread
-from typing import overload, Callable, Any, Union, Dict, List, Tuple, Optional
+from inspect import iscoroutinefunction
+from itertools import count
+from threading import Lock
+from typing import overload, Callable, Any, Union, Tuple, Optional, Dict
 
+from . import monitoring
 from .pyprof import Profiler
 
 
+def _new_disabled_profiler() -> Profiler:
+    """
+    :return: an empty Profiler out of the tree, which records nothing
+    """
+    profiler = object.__new__(Profiler)
+    profiler.__init__("disabled", "__ROOT__")
+    # noinspection PyProtectedMember
+    profiler._disabled = True
+    return profiler
+
+
+# entered by a proxy while profiling is globally disabled, so that `with profile(name) as p` still binds a Profiler
+_disabled_profiler = _new_disabled_profiler()
+
+
+def _check_sample_rate(sample_rate: float):
+    if not 0 < sample_rate <= 1:
+        raise ValueError(f"sample_rate should be in (0, 1], got {sample_rate}")
+
+
 class ProfilerProxy:
-    active_proxy: Dict[Thread, List[Tuple["ProfilerProxy", "Profiler"]]] = defaultdict(list)
+    # whether decorated module-level functions are timed by sys.monitoring events instead of wrappers,
+    # if available (Python 3.12+, otherwise they are wrapped), see `monitoring.register`
+    use_monitoring: bool = True
+    # the stack of active proxies in the current context, i.e., the current thread or asyncio task,
+    # as (proxy, Profiler), followed by the tic id for an untimed entry
+    active_proxy: ContextVar[Tuple[Tuple["ProfilerProxy", "Profiler"], ...]] = ContextVar(
+        "pyprof-active-proxy", default=()
+    )
 
     def __init__(
             self, name: str, report_printer: Callable[[str], Any] = None, flush=False,
-            min_total_percent: float = 0., min_parent_percent: float = 0.
+            min_total_percent: float = 0., min_parent_percent: float = 0., streaming: bool = None,
+            relative_accuracy: float = 0.01, sample_rate: float = 1., windowed: bool = None,
+            cpu_clock: Optional[str] = None, memory: bool = None,
     ):
+        """
+        :param sample_rate: time only one in every round(1 / sample_rate) entries, and only count the others.
+            The totals and percentages are scaled accordingly.
+            An untimed entry reads no clock, but is still entered, so that the Profilers nested in it are resolved
+            under its Profiler, i.e., sampling never changes the shape of the tree.
+        :param cpu_clock: also measure CPU time by "thread" or "process" clock, see `Profiler`
+        :param memory: also measure the net and peak allocated bytes by tracemalloc, see `Profiler`
+        """
+        _check_sample_rate(sample_rate)
         self.name = name
         self.report_printer = report_printer
         self.flush = flush
+        # whether to flush at every entry instead of only at the first one, see `profile`
+        self._flush_every_entry = False
+        self.streaming = streaming
+        self.relative_accuracy = relative_accuracy
+        self.sample_rate = sample_rate
+        self.windowed = windowed
+        self.cpu_clock = cpu_clock
+        self.memory = memory
+        self._sample_period = max(round(1 / sample_rate), 1)
+        self._entries = count()
+        # the code object of the function wrapped by this proxy, if any, which sys.monitoring does not time again
+        self._code = None
+        # the resolved Profiler under each parent Profiler (by id, and the parent is kept alive by the cache),
+        # which is valid until any Profiler is destroyed
+        self._profilers: Dict[int, Tuple[Optional[Profiler], Profiler]] = {}
+        self._generation = Profiler._generation
         self.min_total_percent = min_total_percent
         self.min_parent_percent = min_parent_percent
 
     @classmethod
     def nearest_proxy(cls) -> Optional[Tuple['ProfilerProxy', Profiler]]:
-        current_stack = cls.active_proxy[current_thread()]
+        current_stack = cls.active_proxy.get()
         return current_stack[-1] if current_stack else None
 
     def __enter__(self):
-        profiler = Profiler(
-            self.name,
-            current_profiler(),
-            flush=self.flush,
-        )
-        self.flush = False  # flush for the first tic-toc only
-        self.active_proxy[current_thread()].append((self, profiler))
-        profiler.__enter__()
+        return self._enter(self._sample_period == 1 or next(self._entries) % self._sample_period == 0)
+
+    def _resolve(self, parent: Optional[Profiler]) -> Profiler:
+        """
+        :return: the Profiler of this proxy under the parent Profiler
+        """
+        # noinspection PyProtectedMember
+        if self._generation != Profiler._generation or self.flush:
+            self._profilers = {}
+            # noinspection PyProtectedMember
+            self._generation = Profiler._generation
+        try:
+            return self._profilers[id(parent)][1]
+        except KeyError:
+            profiler = Profiler(
+                self.name,
+                parent,
+                flush=self.flush,
+                streaming=self.streaming,
+                relative_accuracy=self.relative_accuracy,
+                windowed=self.windowed,
+                cpu_clock=self.cpu_clock,
+                memory=self.memory,
+            )
+            self.flush = self._flush_every_entry  # flush for the first tic-toc only, unless at every entry
+            # noinspection PyProtectedMember
+            if self._generation == Profiler._generation:
+                self._profilers[id(parent)] = (parent, profiler)
+            return profiler
+
+    def _enter(self, timed: bool):
+        if not Profiler.enabled:
+            return _disabled_profiler
+        current_stack = self.active_proxy.get()
+        profiler = self._resolve(current_stack[-1][1] if current_stack else None)
+        # noinspection PyProtectedMember
+        if profiler._disabled:
+            # still on the stack, so that the nested proxies are resolved (and disabled) in the subtree
+            self.active_proxy.set(current_stack + ((self, profiler),))
+            return profiler
+        if timed:
+            self.active_proxy.set(current_stack + ((self, profiler),))
+            profiler.tic()
+        else:
+            # an untimed entry reads no clock, and the id of its tic is kept on the stack instead of in a tic
+            # noinspection PyProtectedMember
+            self.active_proxy.set(current_stack + ((self, profiler, profiler._untimed_tic()),))
         return profiler
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        _, profiler = self.active_proxy[current_thread()].pop()
-        profiler.__exit__(exc_type, exc_val, exc_tb)
-        if self.report_printer is not None:
+        current_stack = self.active_proxy.get()
+        # entered while globally disabled
+        if not current_stack or current_stack[-1][0] is not self:
+            return
+        self.active_proxy.set(current_stack[:-1])
+        entry = current_stack[-1]
+        profiler = entry[1]
+        if len(entry) == 3:
+            # noinspection PyProtectedMember
+            profiler._untimed_toc(entry[2])
+        else:
+            profiler.__exit__(exc_type, exc_val, exc_tb)
+        # noinspection PyProtectedMember
+        if self.report_printer is not None and not profiler._disabled:
             self.report_printer(
                 profiler.report_header() + profiler.report(
                     min_total_percent=self.min_total_percent,
@@ -47,23 +154,115 @@ class ProfilerProxy:
             )
 
     def __call__(self, func: Callable):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not Profiler.enabled:
+                    return await func(*args, **kwargs)
+                with self:
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        if ProfilerProxy.use_monitoring and monitoring.register(func, self):
+            return func
+        self._code = getattr(func, "__code__", None)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if not Profiler.enabled:
+                return func(*args, **kwargs)
             with self:
                 return func(*args, **kwargs)
 
         return wrapper
 
 
+class _DisabledProxy:
+    """
+    Returned by `profile(name)` while profiling is globally disabled instead of a ProfilerProxy,
+    so that an inline `with profile(name):` costs a flag check per entry and exit.
+    The ProfilerProxy is built from the kept arguments on first use once enabled,
+    so that a function decorated (or a proxy created) while disabled is still profiled after `enable`.
+    """
+    __slots__ = ("_args", "_proxy")
+    _lock = Lock()
+
+    def __init__(self, args: tuple):
+        self._args = args
+        self._proxy: Optional[ProfilerProxy] = None
+
+    def _resolve(self) -> ProfilerProxy:
+        if self._proxy is None:
+            with self._lock:
+                if self._proxy is None:
+                    self._proxy = ProfilerProxy(*self._args)
+        return self._proxy
+
+    def __enter__(self):
+        if not Profiler.enabled:
+            return _disabled_profiler
+        return self._resolve().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # a no-op if entered while globally disabled, see `ProfilerProxy.__exit__`
+        if self._proxy is not None:
+            self._proxy.__exit__(exc_type, exc_val, exc_tb)
+
+    def __call__(self, func: Callable):
+        return self._resolve()(func)
+
+
 @overload
 def profile(
         name: str, *, report_printer=None, flush: bool = False,
         min_total_percent: float = 0.,
         min_parent_percent: float = 0.,
+        streaming: bool = None,
+        relative_accuracy: float = 0.01,
+        sample_rate: float = 1.,
+        windowed: bool = None,
+        cpu_clock: Optional[str] = None,
+        memory: bool = None,
 ) -> Callable:
     ...
 
 
+class _DisabledProxy:
+    """
+    Returned by `profile(name)` while profiling is globally disabled instead of a ProfilerProxy,
+    so that an inline `with profile(name):` costs a flag check per entry and exit.
+    The ProfilerProxy is built from the kept arguments on first use once enabled,
+    so that a function decorated (or a proxy created) while disabled is still profiled after `enable`.
+    """
+    __slots__ = ("_args", "_proxy")
+    _lock = Lock()
+
+    def __init__(self, args: tuple):
+        self._args = args
+        self._proxy: Optional[ProfilerProxy] = None
+
+    def _resolve(self) -> ProfilerProxy:
+        if self._proxy is None:
+            with self._lock:
+                if self._proxy is None:
+                    self._proxy = ProfilerProxy(*self._args)
+        return self._proxy
+
+    def __enter__(self):
+        if not Profiler.enabled:
+            return _disabled_profiler
+        return self._resolve().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # a no-op if entered while globally disabled, see `ProfilerProxy.__exit__`
+        if self._proxy is not None:
+            self._proxy.__exit__(exc_type, exc_val, exc_tb)
+
+    def __call__(self, func: Callable):
+        return self._resolve()(func)
+
+
 @overload
 def profile(func: Callable) -> Callable:
     ...
@@ -74,28 +273,51 @@ def profile(
         flush: bool = False,
         min_total_percent: float = 0.,
         min_parent_percent: float = 0.,
+        streaming: bool = None,
+        relative_accuracy: float = 0.01,
+        sample_rate: float = 1.,
+        windowed: bool = None,
+        cpu_clock: Optional[str] = None,
+        memory: bool = None,
 ) -> Callable:
     # work as a context manager
     if isinstance(arg, str):
+        if not Profiler.enabled:
+            if not 0 < sample_rate <= 1:
+                _check_sample_rate(sample_rate)
+            return _DisabledProxy((
+                arg, report_printer, flush, min_total_percent, min_parent_percent, streaming,
+                relative_accuracy, sample_rate, windowed, cpu_clock, memory,
+            ))
         return ProfilerProxy(
             arg, report_printer=report_printer, flush=flush,
             min_total_percent=min_total_percent,
             min_parent_percent=min_parent_percent,
+            streaming=streaming,
+            relative_accuracy=relative_accuracy,
+            sample_rate=sample_rate,
+            windowed=windowed,
+            cpu_clock=cpu_clock,
+            memory=memory,
         )
 
     func = arg
 
     # work as a decorator
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        with ProfilerProxy(
-                name=func.__qualname__,
-                report_printer=report_printer,
-                flush=flush,
-        ):
-            return func(*args, **kwargs)
-
-    return wrapper
+    proxy = ProfilerProxy(
+        name=func.__qualname__,
+        report_printer=report_printer,
+        flush=flush,
+        streaming=streaming,
+        relative_accuracy=relative_accuracy,
+        sample_rate=sample_rate,
+        windowed=windowed,
+        cpu_clock=cpu_clock,
+        memory=memory,
+    )
+    # the Profiler of a function decorated directly is flushed at every call, unlike that of a named proxy
+    proxy._flush_every_entry = flush
+    return proxy(func)
 
 
 def current_profiler() -> Optional[Profiler]:
@@ -1,15 +1,127 @@
+import heapq
+import os
 import time
 import warnings
-from functools import lru_cache, wraps
+from array import array
+from contextvars import ContextVar
+from functools import partial, wraps
+from inspect import iscoroutinefunction
 from io import StringIO
-from math import sqrt
-from threading import current_thread, Thread, Lock
-from typing import Callable, Dict, Set, List
+from itertools import count
+from threading import Lock, local
+from typing import Callable, Dict, Set, List, Optional, Tuple, Sequence
+from weakref import ref
+
+from . import allocations, monitoring
+from .statistics import StreamingStatistics, SampleStatistics, RollingStatistics
+
+# the stack of tics in each context (i.e., each thread and each asyncio task) as an immutable linked list of
+# (key of the Profiler, tic, the rest), since the contexts of tasks share it when they are copied.
+# A single ContextVar for all Profilers, since the entries of a ContextVar are never removed from the contexts
+# which have set it, and a ContextVar per Profiler would keep growing with dynamic names.
+_tics: ContextVar[Optional[tuple]] = ContextVar("pyprof-tics", default=None)
+
+# the name of the sibling into which the statistics of evicted Profilers are folded,
+# followed by "@" and the relative accuracy for the Profilers whose accuracy differs from that of the first one
+OTHER = "other"
+
+# the clocks of CPU time which a Profiler may also read at tic and toc, besides the wall clock (perf_counter)
+CPU_CLOCKS: Dict[str, Callable[[], float]] = {
+    "thread": time.thread_time,
+    "process": time.process_time,
+}
+
+
+class _ThreadBuffers:
+    """
+    The buffers and the untimed counter of a thread, each created at its first use,
+    which are folded and dropped by the Profiler once the thread ends
+    """
+    __slots__ = ("buffer", "cpu_buffer", "memory_buffer", "outgoing_buffer", "untimed_counter")
+
+    def __init__(self):
+        # elapsed times, interleaved with their perf_counter timestamps if windowed
+        self.buffer: Optional[List[float]] = None
+        # interleaved (elapsed time, CPU time)
+        self.cpu_buffer: Optional[List[float]] = None
+        # interleaved (net, peak)
+        self.memory_buffer: Optional[List[int]] = None
+        # interleaved (perf_counter at toc, elapsed time or None), see `Profiler._append_outgoing`
+        self.outgoing_buffer: Optional[list] = None
+        # the number of tic-toc-pairs counted without timing, in a one-item list
+        self.untimed_counter: Optional[List[int]] = None
+
+
+class _ThreadHolder:
+    """
+    Kept only in the thread-local storage of a Profiler, so that it is released when the thread ends.
+    It keeps the weak reference to itself whose callback drops the buffers of the thread,
+    so that no reference cycle is made.
+    """
+    __slots__ = ("ref", "__weakref__")
+
+
+def _on_thread_end(profiler_ref: "ref[Profiler]", buffers: _ThreadBuffers, _):
+    # the Profiler is referenced weakly, since the thread-local storage of a live thread (e.g., the main thread)
+    # would otherwise keep destroyed Profilers alive
+    profiler = profiler_ref()
+    if profiler is not None:
+        # noinspection PyProtectedMember
+        profiler._drop_thread_buffers(buffers)
 
 
 class Profiler:
+    """
+    tic-toc-pairs are recorded without any shared lock:
+    the tic is kept in a ContextVar (shared by all Profilers), so that each thread and each asyncio task has its own,
+    and each thread appends elapsed times to its own buffer in thread-local storage.
+    The buffers are merged into the statistics lazily when they are read,
+    or by the recording thread itself once its buffer holds `buffer_size` elapsed times.
+
+    A tic-toc-pair recorded while the parent Profiler is not in tic is also counted in all the ancestors,
+    whose statistics include it without keeping its elapsed time (see `times`).
+    Instead of recording it in each of them, it is kept in an outgoing buffer of the child,
+    which is pulled up level by level when an ancestor is read, or once it holds `buffer_size` elapsed times,
+    so that toc costs amortized O(1) regardless of depth, and the outgoing buffers take bounded memory.
+    """
     _instances: Dict[str, "Profiler"] = {}
-    _lock = Lock()
+    # whether tic-toc-pairs are recorded at all, which is set by `enable` and `disable`,
+    # and can be turned off at startup by the environment variable PYPROF_ENABLED=0
+    enabled: bool = os.environ.get("PYPROF_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+    # the full paths of the subtrees disabled by `disable`, including those not created yet
+    _disabled_paths: Set[str] = set()
+    # the max number of Profilers, e.g., for dynamic names like f"route:{path}", or None for no limit.
+    # Beyond it, the least recently used leaves not in tic are evicted, a tenth of the limit at once.
+    max_profilers: Optional[int] = None
+    # whether the statistics of evicted Profilers are folded into a streaming `OTHER` sibling
+    # (one per relative accuracy), so that they are still reported
+    fold_evicted: bool = True
+    # the number of Profilers evicted since `clean`
+    evicted_count: int = 0
+    _evicting: bool = False
+    # the max number of elapsed times kept in the buffer of each thread before they are merged
+    buffer_size: int = 1024
+    # unique ids of tics
+    _tic_ids = count()
+    # unique keys of Profilers in the tics of each context, which are never reused unlike id()
+    _keys = count()
+    # changed whenever any Profiler is destroyed, so that cached Profilers (see ProfilerProxy) can be invalidated
+    _generation: int = 0
+    # whether new Profilers keep statistics in streaming mode unless specified otherwise
+    default_streaming: bool = False
+    # whether new Profilers keep rolling time-window statistics unless specified otherwise
+    default_windowed: bool = False
+    # the max length of the rolling time windows, and the length of each of their time buckets, in seconds
+    window_span: float = 900.
+    window_resolution: float = 10.
+    # the CPU clock (see CPU_CLOCKS) of new Profilers unless specified otherwise, None not to measure CPU time
+    default_cpu_clock: Optional[str] = None
+    # whether new Profilers track memory allocations unless specified otherwise
+    default_memory: bool = False
+    # serializes the refreshing of the cached report rows
+    _report_lock = Lock()
+    # the sinks into which every timed tic-toc-pair is also written, e.g., TraceLog and SpanRecorder
+    _span_sinks: Tuple = ()
 
     @staticmethod
     def get(full_path: str) -> "Profiler":
@@ -51,49 +163,208 @@ class Profiler:
         if not hasattr(self, '_initialized') or flush:
             return True
 
-    def __init__(self, name: str = "", parent: "Profiler" = None, flush=False):
+    def __init__(
+            self, name: str = "", parent: "Profiler" = None, flush=False, streaming: bool = None,
+            relative_accuracy: float = 0.01, windowed: bool = None, cpu_clock: Optional[str] = None,
+            memory: bool = None,
+    ):
         """
         If the Profiler is inited before, then the __init__ will be skipped
         :param name:
         :param parent:
         :param flush:
+        :param streaming: keep only online statistics (count/total/mean/std/min/max) instead of every elapsed time.
+            Use `Profiler.default_streaming` if None.
+        :param relative_accuracy: the relative error bound of the quantiles of `tail()`, while `min_time` and `max_time`
+            are exact
+        :param windowed: also keep the statistics of the last `Profiler.window_span` seconds (see `window`).
+            Use `Profiler.default_windowed` if None.
+        :param cpu_clock: also measure the CPU time of each timed tic-toc-pair by "thread" (`time.thread_time`)
+            or "process" (`time.process_time`), so that CPU-bound and waiting (I/O, locks or the GIL) time can be
+            told apart. Use `Profiler.default_cpu_clock` if None, and set it to "" not to measure CPU time.
+        :param memory: also measure the net and the peak bytes allocated between tic and toc by tracemalloc,
+            which is started at the first tic if not tracing yet (and stopped once no such tic is open),
+            and slows down all allocations. Each tic and toc resets the process-wide peak of tracemalloc.
+            Use `Profiler.default_memory` if None.
         """
-        self._name = name
-        self._parent, self._full_path = self._generate_full_path(name, parent)
-        del name, parent
-
         # skip init if necessary
         if not self._need_init(flush=flush):
             return
 
-        if self._parent is not None:
-            self._parent._children.add(self)
+        self._name = name
+        self._parent, self._full_path = self._generate_full_path(name, parent)
+        del name, parent
+
+        # whether the Profiler is in a disabled subtree, whose tic-toc-pairs are ignored
+        self._disabled = self._full_path in Profiler._disabled_paths or (
+                self._parent is not None and self._parent._disabled
+        )
+        # the id of the most recent tic, by which cold Profilers are evicted
+        self._last_tic_id = next(self._tic_ids)
+        # whether it is the sibling into which evicted Profilers are folded, which is never evicted itself
+        self._overflow_bucket = False
 
         # destroy existing children if any
         if hasattr(self, '_children'):
-            for _ in self._children:
+            for _ in list(self._children):
                 _._destroy()
         self._children: Set["Profiler"] = set()
 
-        self._elapsed_times = []
-        self._cached_statistics = {}
+        if streaming is None:
+            streaming = Profiler.default_streaming
+        self._merged_statistics = (StreamingStatistics if streaming else SampleStatistics)(relative_accuracy)
+        if windowed is None:
+            windowed = Profiler.default_windowed
+        self._windows = RollingStatistics(
+            Profiler.window_span, Profiler.window_resolution, relative_accuracy,
+        ) if windowed else None
+        if cpu_clock is None:
+            cpu_clock = Profiler.default_cpu_clock
+        if cpu_clock and cpu_clock not in CPU_CLOCKS:
+            raise ValueError(f"cpu_clock should be one of {sorted(CPU_CLOCKS)}, got {cpu_clock!r}")
+        self._cpu_clock_name = cpu_clock or None
+        self._cpu_clock = CPU_CLOCKS[cpu_clock] if cpu_clock else None
+        # the CPU times of the timed tic-toc-pairs, and the wall time of the same pairs
+        self._cpu_statistics = StreamingStatistics(relative_accuracy) if cpu_clock else None
+        self._cpu_wall_total = 0.
+        if memory is None:
+            memory = Profiler.default_memory
+        # the net and the peak allocated bytes of the timed tic-toc-pairs
+        self._memory_net_statistics = StreamingStatistics(relative_accuracy) if memory else None
+        self._memory_peak_statistics = StreamingStatistics(relative_accuracy) if memory else None
+        # the buffers of each live thread which has recorded, see `_local_buffers`
+        self._thread_buffers: List[_ThreadBuffers] = []
+        # the number of tic-toc-pairs counted without timing (see `tic`) merged from elsewhere (e.g., ended threads),
+        # besides the counters of the live threads
+        self._merged_untimed_count = 0
+        # the sum of the counters of all threads when the Profiler was reset
+        self._untimed_count_base = 0
+        # guards self._merged_statistics and the registration of new buffers and counters
+        self._lock = Lock()
+
+        # the key of the (tic, tic id) in `_tics` of each context, and tic is None if not timed
+        self._key = next(Profiler._keys)
+        # the buffers and the untimed counter of each thread, which are also cached in it one by one
+        self._local = local()
+        # ids of the tics not tocked yet, in any thread or task
+        self._active: Set[int] = set()
+        # the tic-toc-pairs to be counted in the parent, i.e., those recorded while the parent is not in tic,
+        # and those pulled from the children.
+        # They are appended to the outgoing buffer of each thread, and folded into the compact outgoing arrays.
+        self._outgoing_timestamps = array('d')
+        self._outgoing_elapsed_times = array('d')
+        self._outgoing_untimed_count = 0
+        self._has_outgoing = False
+        # whether any child has outgoing tic-toc-pairs not pulled yet
+        self._pull_pending = False
 
-        self._tics: Dict[Thread, float] = {}
+        # report() re-renders the statistics columns only of the rows recorded since the last report.
+        # A recording marks its row dirty, and the subtrees of all its ancestors dirty.
+        self._row_dirty = True
+        self._subtree_dirty = True
+        self._report_total = 0.
+        self._report_columns = ""
+        self._report_cpu_columns = f"{'':11}|{'':11}|"
+        self._report_memory_columns = f"{'':11}|{'':11}|"
+        # bumped whenever a Profiler is added to or removed from the subtree, and the caches below are
+        # (structure version, value)
+        self._structure_version = 0
+        self._subtree_profilers_cache: Tuple[int, List["Profiler"]] = (-1, [])
+        self._full_path_width_cache: Tuple[int, int] = (-1, 0)
         self._initialized = time.perf_counter()
+        # published to the readers of the tree (e.g., report() in another thread) only once fully initialized
+        if self._parent is not None:
+            self._parent._children.add(self)
+            self._parent._invalidate_structure()
+
+    def _invalidate_structure(self):
+        profiler = self
+        while profiler is not None:
+            profiler._structure_version += 1
+            profiler._subtree_dirty = True
+            profiler = profiler._parent
+
+    def _mark_dirty(self):
+        self._row_dirty = True
+        profiler = self
+        while profiler is not None and not profiler._subtree_dirty:
+            profiler._subtree_dirty = True
+            profiler = profiler._parent
 
     def _destroy(self):
+        Profiler._generation += 1
         del Profiler._instances[self._full_path]
-        for _ in self._children:
+        for _ in list(self._children):
             # noinspection PyProtectedMember
             _._destroy()
         self._children = set()
 
-    def __new__(cls, name: str = "", parent: "Profiler" = None, flush=False):
+    def __new__(
+            cls, name: str = "", parent: "Profiler" = None, flush=False, streaming: bool = None,
+            relative_accuracy: float = 0.01, windowed: bool = None, cpu_clock: Optional[str] = None,
+            memory: bool = None,
+    ):
         parent, full_path = Profiler._generate_full_path(name, parent)
         if full_path not in Profiler._instances:
+            if Profiler.max_profilers is not None and len(Profiler._instances) >= Profiler.max_profilers:
+                Profiler._evict(parent)
             Profiler._instances[full_path] = super(Profiler, cls).__new__(cls)
         return Profiler._instances[full_path]
 
+    @staticmethod
+    def _initialized_instances() -> List["Profiler"]:
+        """
+        :return: all the Profilers, except those being initialized in another thread
+        """
+        return [_ for _ in list(Profiler._instances.values()) if hasattr(_, "_initialized")]
+
+    @staticmethod
+    def _evict(keep: Optional["Profiler"]):
+        """
+        Evict the least recently used leaves not in tic, a tenth of `max_profilers` at once,
+        so that the cost of finding them is amortized, and the cached Profilers are invalidated only once in a while.
+        Their tic-toc-pairs are still counted in their ancestors.
+        :param keep: the parent of the Profiler being created
+        """
+        if Profiler._evicting:
+            return
+        Profiler._evicting = True
+        try:
+            with Profiler._report_lock:
+                # noinspection PyProtectedMember
+                victims = heapq.nsmallest(
+                    max(Profiler.max_profilers // 10, 1),
+                    [
+                        _ for _ in Profiler._initialized_instances()
+                        if _._parent is not None and not _._children and not _._active
+                        and not _._overflow_bucket and _ is not keep
+                    ],
+                    key=lambda _: _._last_tic_id,
+                )
+                for victim in victims:
+                    parent = victim._parent
+                    # count the tic-toc-pairs not pulled yet in the ancestors
+                    parent._pull()
+                    statistics, untimed_count = victim._reset()
+                    victim._destroy()
+                    parent._children.discard(victim)
+                    parent._invalidate_structure()
+                    Profiler.evicted_count += 1
+                    if not Profiler.fold_evicted:
+                        continue
+                    relative_accuracy = statistics.sketch.relative_accuracy
+                    bucket = Profiler(OTHER, parent, streaming=True, relative_accuracy=relative_accuracy)
+                    if bucket._merged_statistics.sketch.relative_accuracy != relative_accuracy:
+                        # the sketches of different relative accuracy cannot be merged
+                        bucket = Profiler(
+                            f"{OTHER}@{relative_accuracy:g}", parent, streaming=True,
+                            relative_accuracy=relative_accuracy,
+                        )
+                    bucket._overflow_bucket = True
+                    bucket._merge_statistics(statistics, untimed_count)
+        finally:
+            Profiler._evicting = False
+
     def __enter__(self):
         self.tic()
         return self
@@ -102,57 +373,530 @@ class Profiler:
         self.toc()
 
     def __call__(self, func: Callable):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not Profiler.enabled:
+                    return await func(*args, **kwargs)
+                with self:
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if not Profiler.enabled:
+                return func(*args, **kwargs)
             with self:
                 ret = func(*args, **kwargs)
             return ret
 
         return wrapper
 
-    def tic(self):
+    def tic(self, timed: bool = True):
         """
         Record the current perf_counter
+        :param timed: if False, the tic-toc-pair is only counted, and `total` is scaled by the timed ones
         :return:
         """
-        with self._lock:
-            self._tics[current_thread()] = time.perf_counter()
+        if not Profiler.enabled or self._disabled:
+            return
+        tic_id = next(self._tic_ids)
+        self._active.add(tic_id)
+        self._last_tic_id = tic_id
+        rest = _tics.get()
+        if (self._cpu_clock is None and self._memory_net_statistics is None) or not timed:
+            _tics.set((self._key, (time.perf_counter() if timed else None, tic_id), rest))
+        else:
+            # the overhead of tracemalloc is kept outside, and the CPU clock is read inside the wall clock interval
+            memory_tic = allocations.tic(tic_id) if self._memory_net_statistics is not None else None
+            wall_tic = time.perf_counter()
+            tic = (wall_tic, tic_id, self._cpu_clock() if self._cpu_clock is not None else None, memory_tic)
+            _tics.set((self._key, tic, rest))
 
-    @staticmethod
-    def __fill_parent_times_if_not_triggered(profiler: 'Profiler', elapsed_time: float):
+    def _untimed_tic(self) -> int:
         """
-        In case that parent Profiler is not triggered while the children Profiler are
+        Mark the Profiler in tic for its children, for a tic-toc-pair which is only counted,
+        without reading any clock or keeping a tic in the context
+        :return: the tic id to be passed to `_untimed_toc`
         """
-        if profiler is None:
-            return
-        profiler._elapsed_times.append(elapsed_time)
-        profiler._cached_statistics = {}
-        Profiler.__fill_parent_times_if_not_triggered(profiler._parent, elapsed_time)
+        tic_id = next(self._tic_ids)
+        self._active.add(tic_id)
+        self._last_tic_id = tic_id
+        return tic_id
+
+    def _untimed_toc(self, tic_id: int):
+        self._active.discard(tic_id)
+        if Profiler.enabled and not self._disabled:
+            self._record(None)
+
+    def _pop_tic(self) -> Optional[tuple]:
+        """
+        :return: the most recent tic of the current context, which is removed, or None if not in tic
+        """
+        node = _tics.get()
+        if node is not None and node[0] == self._key:
+            _tics.set(node[2])
+            return node[1]
+        # tic-toc-pairs of different Profilers are not nested
+        skipped = []
+        while node is not None and node[0] != self._key:
+            skipped.append(node)
+            node = node[2]
+        if node is None:
+            return None
+        rest = node[2]
+        for key, tic, _ in reversed(skipped):
+            rest = (key, tic, rest)
+        _tics.set(rest)
+        return node[1]
 
     def toc(self):
         """
         Record the difference between the most recent tic and clean the tic
         :return:
         """
+        if not Profiler.enabled or self._disabled:
+            # drop the tic taken before being disabled, if any
+            tic = self._pop_tic()
+            if tic is not None:
+                self._active.discard(tic[1])
+                if len(tic) == 4 and tic[3] is not None:
+                    allocations.toc(tic[1], tic[3])
+            return
+        # the clocks are read first, so that popping the tic is not measured
+        cpu_toc = self._cpu_clock() if self._cpu_clock is not None else None
+        toc = time.perf_counter()
+        tic = self._pop_tic()
+        if tic is None:
+            warnings.warn("Unmatched toc")
+            return
+        self._active.discard(tic[1])
+        if tic[0] is None:
+            self._record(None)
+            return
+        if len(tic) == 4:
+            if tic[3] is not None:
+                allocated = allocations.toc(tic[1], tic[3])
+                if allocated is not None:
+                    self._append_memory(*allocated)
+            self._record(toc - tic[0], toc, cpu_toc - tic[2] if tic[2] is not None and cpu_toc is not None else None)
+        else:
+            self._record(toc - tic[0], toc)
+
+    def _record(
+            self, elapsed_time: Optional[float], timestamp: Optional[float] = None, cpu_time: Optional[float] = None,
+    ):
+        """
+        Append an elapsed time to the buffer of the current thread
+        :param elapsed_time: None for an untimed tic-toc-pair
+        :param timestamp: the perf_counter at toc, if known
+        :param cpu_time: the CPU time of the tic-toc-pair, if measured
+        :return:
+        """
+        if elapsed_time is None:
+            self._count_untimed()
+        else:
+            if cpu_time is not None:
+                self._append_cpu(elapsed_time, cpu_time)
+            self._append(elapsed_time, timestamp)
+        if not self._row_dirty:
+            self._mark_dirty()
+        # parent Profiler is not in tic
+        implicit_parent = self._parent is not None and not self._parent._active
+        if implicit_parent:
+            self._append_outgoing(elapsed_time, timestamp)
+        span_sinks = Profiler._span_sinks
+        if span_sinks and elapsed_time is not None:
+            if timestamp is None:
+                timestamp = time.perf_counter()
+            for sink in span_sinks:
+                sink.write(self.full_path, timestamp, elapsed_time, implicit_parent)
+
+    def _local_buffers(self) -> _ThreadBuffers:
+        """
+        :return: the buffers of the current thread, which are registered at its first recording,
+            until the thread ends
+        """
+        try:
+            return self._local.buffers
+        except AttributeError:
+            buffers = self._local.buffers = _ThreadBuffers()
+            holder = self._local.holder = _ThreadHolder()
+            holder.ref = ref(holder, partial(_on_thread_end, ref(self), buffers))
+            with self._lock:
+                self._thread_buffers.append(buffers)
+            return buffers
+
+    def _drop_thread_buffers(self, buffers: _ThreadBuffers):
+        """
+        Fold the buffers and the untimed counter of an ended thread, and stop walking them on every merge
+        :param buffers:
+        :return:
+        """
         with self._lock:
-            if current_thread() not in self._tics:
-                warnings.warn("Unmatched toc")
+            if buffers not in self._thread_buffers:
+                # registered before the Profiler was initialized again (e.g., flushed), so they are discarded
                 return
-            self._elapsed_times.append(time.perf_counter() - self._tics[current_thread()])
-            if self._parent is not None and not self._parent._tics:  # parent Profiler is not in tic
-                self.__fill_parent_times_if_not_triggered(self._parent, self._elapsed_times[-1])
-            self._cached_statistics = {}
-            del self._tics[current_thread()]
+        if self._parent is not None:
+            self._fold_outgoing()
+        with self._lock:
+            self.__merge_buffers_locked()
+            self._thread_buffers.remove(buffers)
+            if buffers.untimed_counter is not None:
+                self._merged_untimed_count += buffers.untimed_counter[0]
+
+    def _append(self, elapsed_time: float, timestamp: Optional[float] = None):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = self._local_buffers().buffer = []
+        if self._windows is not None:
+            buffer.append(timestamp if timestamp is not None else time.perf_counter())
+        buffer.append(elapsed_time)
+        if len(buffer) >= self.buffer_size:
+            self._merge_buffers()
+
+    def _append_cpu(self, elapsed_time: float, cpu_time: float):
+        try:
+            buffer = self._local.cpu_buffer
+        except AttributeError:
+            buffer = self._local.cpu_buffer = self._local_buffers().cpu_buffer = []
+        buffer.append(elapsed_time)
+        buffer.append(cpu_time)
+
+    def _append_memory(self, net: int, peak: int):
+        try:
+            buffer = self._local.memory_buffer
+        except AttributeError:
+            buffer = self._local.memory_buffer = self._local_buffers().memory_buffer = []
+        buffer.append(net)
+        buffer.append(peak)
+
+    def _append_outgoing(self, elapsed_time: Optional[float], timestamp: Optional[float] = None):
+        try:
+            buffer = self._local.outgoing_buffer
+        except AttributeError:
+            buffer = self._local.outgoing_buffer = self._local_buffers().outgoing_buffer = []
+        # the timestamp of an untimed tic-toc-pair is dropped when folded
+        if elapsed_time is None:
+            buffer.append(0.)
+        else:
+            buffer.append(timestamp if timestamp is not None else time.perf_counter())
+        buffer.append(elapsed_time)
+        if not self._has_outgoing:
+            self._has_outgoing = True
+            self._parent._mark_pull_pending()
+        if len(buffer) >= 2 * self.buffer_size:
+            self._fold_outgoing()
+
+    def _fold_outgoing(self):
+        """
+        Fold the outgoing buffers of all threads, and pass the outgoing arrays on to the parent right away
+        once they hold `buffer_size` elapsed times, so that they take bounded memory even if no ancestor is ever read
+        """
+        with self._lock:
+            self.__fold_outgoing_locked()
+            full = len(self._outgoing_elapsed_times) >= self.buffer_size
+        if full:
+            self._parent._absorb(*self._take_outgoing())
+
+    def __fold_outgoing_locked(self):
+        """
+        Move the outgoing tic-toc-pairs in the buffers of all threads into the compact outgoing arrays
+        """
+        for buffers in self._thread_buffers:
+            buffer = buffers.outgoing_buffer
+            n = len(buffer) if buffer else 0
+            n -= n % 2  # the owner thread may have appended a timestamp but not the elapsed time yet
+            if n > 0:
+                pairs = buffer[:n]
+                del buffer[:n]
+                timestamps, elapsed_times = pairs[0::2], pairs[1::2]
+                if None in elapsed_times:
+                    timestamps = [t for t, e in zip(timestamps, elapsed_times) if e is not None]
+                    elapsed_times = [_ for _ in elapsed_times if _ is not None]
+                    self._outgoing_untimed_count += n // 2 - len(elapsed_times)
+                self._outgoing_timestamps.extend(timestamps)
+                self._outgoing_elapsed_times.extend(elapsed_times)
+
+    def _take_outgoing(self) -> Tuple[array, array, int]:
+        """
+        :return: the timestamps and the elapsed times of the outgoing timed tic-toc-pairs,
+            and the number of the outgoing untimed ones
+        """
+        with self._lock:
+            self.__fold_outgoing_locked()
+            ret = self._outgoing_timestamps, self._outgoing_elapsed_times, self._outgoing_untimed_count
+            self._outgoing_timestamps, self._outgoing_elapsed_times = array('d'), array('d')
+            self._outgoing_untimed_count = 0
+        return ret
+
+    def _mark_pull_pending(self):
+        profiler = self
+        while profiler is not None and not profiler._pull_pending:
+            profiler._pull_pending = True
+            profiler = profiler._parent
+
+    def _pull(self, mark_parent: bool = True):
+        """
+        Count the outgoing tic-toc-pairs of the descendants, and pass them on to the parent.
+        Each level merges them as arrays, so the cost per tic-toc-pair and level is a memcpy.
+        :param mark_parent: whether to let the parent pull them when it is read.
+            Not necessary if the parent is pulling right now.
+        :return:
+        """
+        if not self._pull_pending:
+            return
+        # clear the flag before taking, so that concurrent recordings set it again
+        self._pull_pending = False
+        timestamps, elapsed_times, untimed_count = array('d'), array('d'), 0
+        for child in list(self._children):
+            child._pull(mark_parent=False)
+            if child._has_outgoing:
+                child._has_outgoing = False
+                child_timestamps, child_elapsed_times, child_untimed_count = child._take_outgoing()
+                timestamps.extend(child_timestamps)
+                elapsed_times.extend(child_elapsed_times)
+                untimed_count += child_untimed_count
+        self._absorb(timestamps, elapsed_times, untimed_count, mark_parent)
+
+    def _absorb(self, timestamps: array, elapsed_times: array, untimed_count: int, mark_parent: bool = True):
+        """
+        Count tic-toc-pairs taken from the outgoing arrays of the descendants, and pass them on to the parent.
+        They are pulled into the parent right away once the outgoing arrays hold `buffer_size` elapsed times.
+        :param timestamps:
+        :param elapsed_times:
+        :param untimed_count:
+        :param mark_parent: whether to let the parent pull them when it is read
+        :return:
+        """
+        if not elapsed_times and untimed_count == 0:
+            return
+        full = False
+        with self._lock:
+            # the elapsed times of the descendants are never kept, even in sample mode, so that the ancestors of
+            # streaming Profilers (e.g., the root, which is never in tic) take constant memory too
+            self._merged_statistics.extend_online(elapsed_times)
+            self._merged_untimed_count += untimed_count
+            if self._windows is not None:
+                interleaved = [0.] * (2 * len(elapsed_times))
+                interleaved[0::2], interleaved[1::2] = timestamps, elapsed_times
+                self._windows.extend(interleaved)
+            if self._parent is not None:
+                self._outgoing_timestamps.extend(timestamps)
+                self._outgoing_elapsed_times.extend(elapsed_times)
+                self._outgoing_untimed_count += untimed_count
+                full = len(self._outgoing_elapsed_times) >= self.buffer_size
+        if full:
+            self._parent._absorb(*self._take_outgoing())
+        elif self._parent is not None:
+            self._has_outgoing = True
+            if mark_parent:
+                self._parent._mark_pull_pending()
+        self._mark_dirty()
+
+    def _count_untimed(self):
+        try:
+            counter = self._local.untimed_counter
+        except AttributeError:
+            counter = self._local.untimed_counter = self._local_buffers().untimed_counter = [0]
+        counter[0] += 1
+
+    def _merge_buffers(self):
+        """
+        Move the elapsed times in the buffers of all threads into the merged statistics.
+        The owner threads may append to the buffers concurrently, since only a prefix of each buffer is removed.
+        """
+        self._pull()
+        with self._lock:
+            self.__merge_buffers_locked()
+
+    def __merge_buffers_locked(self):
+        for buffers in self._thread_buffers:
+            buffer = buffers.buffer
+            n = len(buffer) if buffer else 0
+            if self._windows is not None:
+                n -= n % 2  # the owner thread may have appended a timestamp but not the elapsed time yet
+            if n > 0:
+                elapsed_times = buffer[:n]
+                del buffer[:n]
+                if self._windows is not None:
+                    self._windows.extend(elapsed_times)
+                    elapsed_times = elapsed_times[1::2]
+                self._merged_statistics.extend(elapsed_times)
+            buffer = buffers.cpu_buffer
+            n = len(buffer) if buffer else 0
+            n -= n % 2
+            if n > 0:
+                pairs = buffer[:n]
+                del buffer[:n]
+                self._cpu_wall_total += sum(pairs[0::2])
+                self._cpu_statistics.extend(pairs[1::2])
+            buffer = buffers.memory_buffer
+            n = len(buffer) if buffer else 0
+            n -= n % 2
+            if n > 0:
+                pairs = buffer[:n]
+                del buffer[:n]
+                self._memory_net_statistics.extend(pairs[0::2])
+                self._memory_peak_statistics.extend(pairs[1::2])
+
+    def __sum_untimed_counters_locked(self) -> int:
+        return sum(
+            buffers.untimed_counter[0] for buffers in self._thread_buffers if buffers.untimed_counter is not None
+        )
+
+    def _reset(self) -> Tuple[StreamingStatistics, int]:
+        """
+        Atomically take the statistics and the untimed count recorded so far and start over,
+        without dropping any tic-toc-pair recorded concurrently
+        :return:
+        """
+        self._pull()
+        with self._lock:
+            self.__merge_buffers_locked()
+            statistics = self._merged_statistics
+            self._merged_statistics = statistics.empty_like()
+            if self._cpu_statistics is not None:
+                self._cpu_statistics = self._cpu_statistics.empty_like()
+                self._cpu_wall_total = 0.
+            if self._memory_net_statistics is not None:
+                self._memory_net_statistics = self._memory_net_statistics.empty_like()
+                self._memory_peak_statistics = self._memory_peak_statistics.empty_like()
+            untimed_count = self.__sum_untimed_counters_locked()
+            untimed_count, self._untimed_count_base = untimed_count - self._untimed_count_base, untimed_count
+            untimed_count, self._merged_untimed_count = untimed_count + self._merged_untimed_count, 0
+        self._mark_dirty()
+        return statistics, untimed_count
+
+    def _merge_statistics(self, statistics: StreamingStatistics, untimed_count: int = 0):
+        """
+        Add the statistics of tic-toc-pairs recorded elsewhere, e.g., in another process
+        :param statistics:
+        :param untimed_count:
+        :return:
+        """
+        with self._lock:
+            self._merged_statistics.merge(statistics)
+            self._merged_untimed_count += untimed_count
+        self._mark_dirty()
 
     @property
-    def sorted_times(self) -> List[float]:
-        if "sorted_elapsed_times" not in self._cached_statistics:
-            self._cached_statistics['sorted_elapsed_times'] = sorted(self._elapsed_times)
-        return self._cached_statistics['sorted_elapsed_times']
+    def windowed(self) -> bool:
+        return self._windows is not None
+
+    def window(self, seconds: float) -> StreamingStatistics:
+        """
+        Get the statistics of the timed tic-toc-pairs in the last `seconds`, limited to `Profiler.window_span`.
+        The window is made of whole `Profiler.window_resolution` buckets including the ongoing one, which has only
+        partly elapsed, so it may cover up to one bucket less than `seconds` (see `RollingStatistics.window`).
+        :param seconds:
+        :return:
+        """
+        if self._windows is None:
+            raise RuntimeError(f"Profiler {self.full_path!r} does not keep rolling time windows")
+        self._pull()
+        with self._lock:
+            self.__merge_buffers_locked()
+            return self._windows.window(seconds, time.perf_counter())
+
+    @property
+    def _statistics(self) -> StreamingStatistics:
+        self._merge_buffers()
+        return self._merged_statistics
+
+    @property
+    def streaming(self) -> bool:
+        """
+        Whether only online statistics are kept
+        :return:
+        """
+        return not isinstance(self._merged_statistics, SampleStatistics)
+
+    @property
+    def cpu_clock(self) -> Optional[str]:
+        """
+        :return: "thread" or "process" if CPU time is measured, otherwise None
+        """
+        return self._cpu_clock_name
 
     @property
-    def times(self) -> List[float]:
-        return self._elapsed_times
+    def cpu_statistics(self) -> StreamingStatistics:
+        """
+        Get the statistics of the CPU times of the timed tic-toc-pairs.
+        Only the tic-toc-pairs of this Profiler are included, but not those counted from its children
+        while it is not in tic.
+        :return:
+        """
+        if self._cpu_statistics is None:
+            raise RuntimeError(f"Profiler {self.full_path!r} does not measure CPU time")
+        with self._lock:
+            self.__merge_buffers_locked()
+            return self._cpu_statistics
+
+    @property
+    def cpu_total(self) -> float:
+        return self.cpu_statistics.total
+
+    @property
+    def cpu_utilization(self) -> float:
+        """
+        Get the CPU time divided by the wall time of the same tic-toc-pairs,
+        e.g., near 1 if CPU-bound, and near 0 if waiting for I/O, locks or the GIL.
+        It may exceed 1 with the "process" clock if other threads run meanwhile.
+        :return: 0 if nothing is measured
+        """
+        statistics = self.cpu_statistics
+        return statistics.total / self._cpu_wall_total if self._cpu_wall_total > 0 else 0.
+
+    @property
+    def memory(self) -> bool:
+        """
+        Whether the allocated bytes are measured
+        :return:
+        """
+        return self._memory_net_statistics is not None
+
+    def _memory_statistics(self) -> Tuple[StreamingStatistics, StreamingStatistics]:
+        if self._memory_net_statistics is None:
+            raise RuntimeError(f"Profiler {self.full_path!r} does not measure memory allocations")
+        with self._lock:
+            self.__merge_buffers_locked()
+            return self._memory_net_statistics, self._memory_peak_statistics
+
+    @property
+    def memory_net_statistics(self) -> StreamingStatistics:
+        """
+        Get the statistics of the net allocated bytes, i.e., allocated minus freed, of the timed tic-toc-pairs.
+        The allocations of other threads running meanwhile are included, since tracemalloc is process-wide.
+        :return:
+        """
+        return self._memory_statistics()[0]
+
+    @property
+    def memory_peak_statistics(self) -> StreamingStatistics:
+        """
+        Get the statistics of the peak allocated bytes above the start of the timed tic-toc-pairs,
+        which equals the net on Python < 3.9
+        :return:
+        """
+        return self._memory_statistics()[1]
+
+    @property
+    def sorted_times(self) -> Sequence[float]:
+        if self.streaming:
+            raise RuntimeError("elapsed times are not kept in streaming mode")
+        return self._statistics.sorted_times
+
+    @property
+    def times(self) -> Sequence[float]:
+        """
+        :return: a copy of the timed elapsed times, in the order merged.
+            Only the tic-toc-pairs of this Profiler are kept, but not those counted from its children
+            while it is not in tic, which are only included in the statistics.
+        """
+        return self._statistics.times
 
     @property
     def name(self) -> str:
@@ -165,107 +909,178 @@ class Profiler:
     @property
     def count(self) -> int:
         """
-        Get the number of tic-toc-pairs
+        Get the number of tic-toc-pairs, including the untimed ones
+        :return:
+        """
+        return self._statistics.count + self.untimed_count
+
+    @property
+    def timed_count(self) -> int:
+        """
+        Get the number of timed tic-toc-pairs, from which the other statistics are computed
         :return:
         """
-        return len(self.times)
+        return self._statistics.count
+
+    @property
+    def untimed_count(self) -> int:
+        self._pull()
+        # under the lock, since the counters of ended threads are moved into the merged count
+        with self._lock:
+            return (
+                    self._merged_untimed_count - self._untimed_count_base
+                    + self.__sum_untimed_counters_locked()
+            )
 
     @property
     def total(self) -> float:
         """
-        Get the total time of all tic-toc-pairs
+        Get the total time of all tic-toc-pairs.
+        If some are untimed, it is estimated from the average of the timed ones.
         :return:
         """
-        if self.count == 0:
-            return 0
-        if "total" not in self._cached_statistics:
-            self._cached_statistics['total'] = sum(self.times)
-        return self._cached_statistics['total']
+        untimed_count = self.untimed_count
+        if untimed_count == 0:
+            return self._statistics.total
+        return self._statistics.average * (self._statistics.count + untimed_count)
+
+    @property
+    def self_time(self) -> float:
+        """
+        Get the exclusive time, i.e., the total minus the totals of the children.
+        Children run concurrently in other threads (e.g., by `ProfiledThreadPoolExecutor`)
+        may add up to more than the total, so it is clamped to 0. See `self_times` for all Profilers at once.
+        :return:
+        """
+        return max(self.total - sum([_.total for _ in list(self._children)]), 0.)
 
     def tail(self, percentile: float) -> float:
-        if self.count == 0:
-            return 0
-        idx = int(percentile * 0.01 * self.count)
-        return self.sorted_times[idx]
+        """
+        Estimate the percentile of elapsed times from a quantile sketch, without sorting them
+        :param percentile: in [0, 100]
+        :return:
+        """
+        return self._statistics.tail(percentile)
 
     @property
     def average(self) -> float:
-        if self.count == 0:
-            return 0
-        if "average" not in self._cached_statistics:
-            self._cached_statistics['average'] = sum(self.times) / self.count
-        return self._cached_statistics['average']
+        return self._statistics.average
 
     @property
     def standard_deviation(self) -> float:
-        if self.count == 0:
-            return 0
-        if "std" not in self._cached_statistics:
-            self._cached_statistics['std'] = sqrt(sum([(_ - self.average) ** 2 for _ in self.times]) / self.count)
-        return self._cached_statistics['std']
+        return self._statistics.standard_deviation
 
     @property
     def min_time(self) -> float:
-        if self.count == 0:
-            return 0
-        return self.sorted_times[0]
+        return self._statistics.min_time
 
     @property
     def max_time(self) -> float:
-        if self.count == 0:
-            return 0
-        return self.sorted_times[-1]
+        return self._statistics.max_time
 
-    def report(self, full_path_width=None, min_total_percent: float = 0, min_parent_percent: float = 0) -> str:
-        if full_path_width is not None:
-            full_path_width = full_path_width
-        else:
+    def report(
+            self, full_path_width=None, min_total_percent: float = 0, min_parent_percent: float = 0,
+            windows: Sequence[float] = (), cpu: bool = False, self_time: bool = False, memory: bool = False,
+    ) -> str:
+        """
+        Only the statistics of the Profilers recorded since the last report are computed again
+        :param full_path_width:
+        :param min_total_percent:
+        :param min_parent_percent:
+        :param windows: add the count, mean and p99 in the last such seconds for windowed Profilers
+        :param cpu: add the CPU time and the CPU utilization for the Profilers measuring CPU time
+        :param self_time: add the self time (see `self_time`) and its percentage of the total of the root
+        :param memory: add the mean net and peak allocated bytes for the Profilers measuring memory allocations
+        :return:
+        """
+        if full_path_width is None:
             full_path_width = self._max_children_full_path_length()
-        total_percent = self.total / max(_root_profiler.total, 1e-4) * 100
-        if self._parent is not None:
-            parent_percent = self.total / max(self._parent.total, 1e-4) * 100
-        else:
-            parent_percent = total_percent
-        with StringIO() as ret:
-            if total_percent >= min_total_percent * 100 and parent_percent >= min_parent_percent * 100:
-                print(
-                    f"|{self.full_path:<{full_path_width}}"
-                    f"|{total_percent:10.2f}%"
-                    f"|{parent_percent:10.2f}%"
-                    f"|{self.count:8}"
-                    f"|{self.total:10.3f}s"
-                    f"|{self.average:10.3f}(±{self.standard_deviation:10.3f})s"
-                    f"|{self.min_time:10.3f}~{self.max_time:10.3f}"
-                    f"|",
-                    file=ret,
-                )
-            for child in sorted(self._children, key=lambda _: _.name):
-                print(child.report(
-                    full_path_width=full_path_width,
-                    min_total_percent=min_total_percent,
-                    min_parent_percent=min_parent_percent,
-                ), file=ret, end="")
-            return ret.getvalue()
-
-    def report_header(self) -> str:
-        full_path_width = self._max_children_full_path_length()
-        with StringIO() as ret:
-            print(
-                f"|{'path':<{full_path_width}}"
-                f"|{'%total':11}"
-                f"|{'%parent':11}"
-                f"|{'count':<8}"
-                f"|{'total':11}"
-                f"|{'mean(±std)':<24}"
-                f"|{'min-max':<21}"
-                f"|",
-                file=ret,
+        with Profiler._report_lock:
+            self._refresh_report()
+            root_total = self._report_total if self._parent is None else _root_profiler.total
+            ret = []
+            for profiler in self._subtree_profilers():
+                total = profiler._report_total
+                total_percent = total / max(root_total, 1e-4) * 100
+                if profiler is not self:
+                    parent_percent = total / max(profiler._parent._report_total, 1e-4) * 100
+                elif self._parent is not None:
+                    parent_percent = total / max(self._parent.total, 1e-4) * 100
+                else:
+                    parent_percent = total_percent
+                if total_percent >= min_total_percent * 100 and parent_percent >= min_parent_percent * 100:
+                    if self_time:
+                        exclusive = max(total - sum([_._report_total for _ in list(profiler._children)]), 0.)
+                        self_columns = f"{exclusive:10.3f}s|{exclusive / max(root_total, 1e-4) * 100:10.2f}%|"
+                    else:
+                        self_columns = ""
+                    ret.append(
+                        _format_report_path_columns(profiler.full_path, full_path_width, total_percent, parent_percent)
+                        + profiler._report_columns + self_columns + (profiler._report_cpu_columns if cpu else "")
+                        + (profiler._report_memory_columns if memory else "")
+                        + profiler._format_window_columns(windows) + "\n"
+                    )
+            return "".join(ret)
+
+    def _refresh_report(self):
+        """
+        Compute the statistics columns of the dirty rows in the subtree
+        """
+        if not self._subtree_dirty:
+            return
+        # the pulled tic-toc-pairs mark their rows dirty
+        self._pull()
+        # clear the flags before reading the statistics, so that concurrent recordings mark them dirty again
+        self._subtree_dirty = False
+        if self._row_dirty:
+            self._row_dirty = False
+            self._report_total = self.total
+            self._report_columns = _format_report_statistics_columns(
+                self.count, self._report_total, self.average, self.standard_deviation, self.min_time, self.max_time,
             )
-            return ret.getvalue()
+            if self._cpu_statistics is not None:
+                self._report_cpu_columns = f"{self.cpu_total:10.3f}s|{self.cpu_utilization * 100:10.2f}%|"
+            if self._memory_net_statistics is not None:
+                net, peak = self._memory_statistics()
+                self._report_memory_columns = f"{net.average:10.0f}B|{peak.average:10.0f}B|"
+        for child in list(self._children):
+            child._refresh_report()
+
+    def _subtree_profilers(self) -> List["Profiler"]:
+        """
+        :return: the Profilers in the subtree in the order of report
+        """
+        version, profilers = self._subtree_profilers_cache
+        if version != self._structure_version:
+            version, profilers = self._structure_version, [self]
+            for child in sorted(list(self._children), key=lambda _: _.name):
+                profilers.extend(child._subtree_profilers())
+            self._subtree_profilers_cache = version, profilers
+        return profilers
+
+    def _format_window_columns(self, windows: Sequence[float]) -> str:
+        ret = []
+        for seconds in windows:
+            if self._windows is None:
+                ret.append(f"{'':10}|{'':11}|{'':11}|")
+            else:
+                statistics = self.window(seconds)
+                ret.append(f"{statistics.count:10}|{statistics.average:10.3f}s|{statistics.tail(99):10.3f}s|")
+        return "".join(ret)
+
+    def report_header(
+            self, windows: Sequence[float] = (), cpu: bool = False, self_time: bool = False, memory: bool = False,
+    ) -> str:
+        return _format_report_header(self._max_children_full_path_length(), windows, cpu, self_time, memory)
 
-    @lru_cache(maxsize=None)
-    def _max_children_full_path_length(self):
-        return max([len(self.full_path)] + [child._max_children_full_path_length() for child in self._children])
+    def _max_children_full_path_length(self) -> int:
+        version, width = self._full_path_width_cache
+        if version != self._structure_version:
+            version, width = self._structure_version, max(
+                [len(self.full_path)] + [child._max_children_full_path_length() for child in list(self._children)]
+            )
+            self._full_path_width_cache = version, width
+        return width
 
     def __str__(self):
         return self.report()
@@ -280,25 +1095,176 @@ class Profiler:
         return hash(self.full_path)
 
 
+def _format_report_header(
+        full_path_width: int, windows: Sequence[float] = (), cpu: bool = False, self_time: bool = False,
+        memory: bool = False,
+) -> str:
+    with StringIO() as ret:
+        print(
+            f"|{'path':<{full_path_width}}"
+            f"|{'%total':11}"
+            f"|{'%parent':11}"
+            f"|{'count':<8}"
+            f"|{'total':11}"
+            f"|{'mean(±std)':<24}"
+            f"|{'min-max':<21}"
+            f"|",
+            file=ret,
+            end="",
+        )
+        if self_time:
+            print(f"{'self':<11}|{'%self':<11}|", file=ret, end="")
+        if cpu:
+            print(f"{'cpu':<11}|{'%cpu':<11}|", file=ret, end="")
+        if memory:
+            print(f"{'net/call':<11}|{'peak/call':<11}|", file=ret, end="")
+        for seconds in windows:
+            span = _format_span(seconds)
+            print(f"{'count@' + span:<10}|{'mean@' + span:<11}|{'p99@' + span:<11}|", file=ret, end="")
+        print(file=ret)
+        return ret.getvalue()
+
+
+def _format_span(seconds: float) -> str:
+    """
+    e.g., 45s, 5m, 1h
+    """
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600:g}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60:g}m"
+    return f"{seconds:g}s"
+
+
+def _format_report_row(
+        full_path: str, full_path_width: int, total_percent: float, parent_percent: float,
+        count: int, total: float, average: float, standard_deviation: float, min_time: float, max_time: float,
+) -> str:
+    return _format_report_path_columns(
+        full_path, full_path_width, total_percent, parent_percent,
+    ) + _format_report_statistics_columns(count, total, average, standard_deviation, min_time, max_time)
+
+
+def _format_report_path_columns(
+        full_path: str, full_path_width: int, total_percent: float, parent_percent: float,
+) -> str:
+    return (
+        f"|{full_path:<{full_path_width}}"
+        f"|{total_percent:10.2f}%"
+        f"|{parent_percent:10.2f}%"
+    )
+
+
+def _format_report_statistics_columns(
+        count: int, total: float, average: float, standard_deviation: float, min_time: float, max_time: float,
+) -> str:
+    return (
+        f"|{count:8}"
+        f"|{total:10.3f}s"
+        f"|{average:10.3f}(±{standard_deviation:10.3f})s"
+        f"|{min_time:10.3f}~{max_time:10.3f}"
+        f"|"
+    )
+
+
+def _set_enabled(enabled: bool, full_path: Optional[str]):
+    if full_path is None:
+        Profiler.enabled = enabled
+        monitoring.set_enabled(enabled)
+        return
+    if enabled:
+        Profiler._disabled_paths.discard(full_path)
+    else:
+        Profiler._disabled_paths.add(full_path)
+    # parents before children
+    for profiler in sorted(Profiler._initialized_instances(), key=lambda _: _.full_path):
+        path = profiler.full_path
+        if path == full_path or path.startswith(f"{full_path}/"):
+            # noinspection PyProtectedMember
+            profiler._disabled = path in Profiler._disabled_paths or (
+                    profiler._parent is not None and profiler._parent._disabled
+            )
+
+
+def enable(full_path: Optional[str] = None):
+    """
+    Resume recording tic-toc-pairs, e.g., from a signal handler
+    :param full_path: resume only the subtree of this path disabled by `disable(full_path)`,
+        or resume globally if None
+    :return:
+    """
+    _set_enabled(True, full_path)
+
+
+def disable(full_path: Optional[str] = None):
+    """
+    Stop recording tic-toc-pairs until `enable`.
+    Globally disabled, a decorated function costs a flag check per call (and nothing with sys.monitoring),
+    and a context manager a flag check per entry and exit, as `profile(name)` builds no ProfilerProxy until enabled.
+    :param full_path: disable only the subtree of this path, including its Profilers created later,
+        or disable globally if None
+    :return:
+    """
+    _set_enabled(False, full_path)
+
+
+def is_enabled(full_path: Optional[str] = None) -> bool:
+    """
+    :param full_path: whether the subtree of this path is enabled, or whether it is globally enabled if None
+    :return:
+    """
+    if not Profiler.enabled:
+        return False
+    if full_path is None:
+        return True
+    while full_path:
+        if full_path in Profiler._disabled_paths:
+            return False
+        full_path = full_path.rsplit("/", 1)[0]
+    return "" not in Profiler._disabled_paths
+
+
 def clean():
     """
     Reset the global instance and clean all instances
     :return:
     """
     global _root_profiler
+    Profiler._generation += 1
     Profiler._instances = {}
     Profiler._active_instances = {}
+    Profiler.evicted_count = 0
     # noinspection PyTypeChecker
     _root_profiler = Profiler("", "__ROOT__")
 
 
-def report(min_total_percent: float = 0., min_parent_percent: float = 0.) -> str:
-    body = _root_profiler.report(min_total_percent=min_total_percent, min_parent_percent=min_parent_percent)
-    return f'{_root_profiler.report_header()}{body}'
+def report(
+        min_total_percent: float = 0., min_parent_percent: float = 0., windows: Sequence[float] = (),
+        cpu: bool = False, self_time: bool = False, memory: bool = False,
+) -> str:
+    """
+    :param min_total_percent:
+    :param min_parent_percent:
+    :param windows: add the count, mean and p99 in the last such seconds for windowed Profilers,
+        e.g., (60, 300, 900)
+    :param cpu: add the CPU time and the CPU utilization (CPU time / wall time, as %cpu)
+        for the Profilers measuring CPU time (see `cpu_clock`)
+    :param self_time: add the self time, i.e., the total minus the totals of the children, and its percentage
+    :param memory: add the mean net and peak allocated bytes per call for the Profilers measuring memory allocations
+    :return:
+    """
+    body = _root_profiler.report(
+        min_total_percent=min_total_percent, min_parent_percent=min_parent_percent, windows=windows, cpu=cpu,
+        self_time=self_time, memory=memory,
+    )
+    if Profiler.evicted_count:
+        body += f"{Profiler.evicted_count} Profilers evicted (see Profiler.max_profilers)\n"
+    return f'{_root_profiler.report_header(windows, cpu, self_time, memory)}{body}'
 
 
 # noinspection PyTypeChecker
 _root_profiler = None  # type: Profiler
 clean()
+monitoring.set_enabled(Profiler.enabled)
 
-__all__ = ["Profiler", "clean", "report"]
+__all__ = ["Profiler", "OTHER", "clean", "report", "enable", "disable", "is_enabled"]
@@ -0,0 +1,80 @@
+import logging
+from threading import Thread, Event
+from typing import Callable, Any
+
+from .pyprof import report
+from .snapshot import snapshot, report_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundReporter:
+    """
+    Periodically emit the report of all Profilers from a background thread,
+    so that no report is formatted on the profiled threads
+    """
+
+    def __init__(
+            self, interval: float, report_printer: Callable[[str], Any] = print, reset: bool = False,
+            min_total_percent: float = 0., min_parent_percent: float = 0.,
+    ):
+        """
+        :param interval: in seconds
+        :param report_printer:
+        :param reset: report only the last interval, by atomically resetting the statistics of every Profiler
+            after each report
+        :param min_total_percent:
+        :param min_parent_percent:
+        """
+        if interval <= 0:
+            raise ValueError(f"interval should be positive, got {interval}")
+        self.interval = interval
+        self.report_printer = report_printer
+        self.reset = reset
+        self.min_total_percent = min_total_percent
+        self.min_parent_percent = min_parent_percent
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, name="pyprof-reporter", daemon=True)
+
+    def emit(self):
+        """
+        Emit a report immediately
+        :return:
+        """
+        if self.reset:
+            ret = report_snapshot(
+                snapshot(reset=True),
+                min_total_percent=self.min_total_percent, min_parent_percent=self.min_parent_percent,
+            )
+        else:
+            ret = report(min_total_percent=self.min_total_percent, min_parent_percent=self.min_parent_percent)
+        self.report_printer(ret)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            # keep reporting after a failure, e.g., of the report printer
+            try:
+                self.emit()
+            except Exception:
+                logger.exception("Failed to emit the report of the Profilers")
+
+    def start(self) -> "BackgroundReporter":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background thread, without emitting the report of the ongoing interval
+        :return:
+        """
+        self._stopped.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+__all__ = ["BackgroundReporter"]
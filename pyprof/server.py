@@ -0,0 +1,118 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+from typing import Sequence, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from .export import report_json, report_prometheus
+
+
+class MetricsServer:
+    """
+    Serve the statistics of all Profilers over HTTP from a background thread, with only the standard library:
+    - `/metrics`: the Prometheus text exposition format (see `report_prometheus`)
+    - `/metrics.json`: JSON (see `report_json`)
+
+    Both accept the query parameters `min_total_percent`, `min_parent_percent` and `percentiles` (comma-separated),
+    e.g., `/metrics?min_total_percent=0.01&percentiles=50,99`.
+    Scrapes only merge the buffers of the Profilers, so they never block tic or toc.
+    """
+
+    def __init__(
+            self, port: int = 0, host: str = "127.0.0.1", percentiles: Sequence[float] = (50, 90, 99),
+            prefix: str = "pyprof",
+    ):
+        """
+        :param port: 0 to pick a free port, see `address`
+        :param host: listen on localhost only by default
+        :param percentiles: the default percentiles
+        :param prefix: the prefix of the Prometheus metric names
+        """
+        self.percentiles = tuple(percentiles)
+        self.prefix = prefix
+        # serializes scrapes, so that each of them reads the Profilers as of a single walk of the tree
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, name="pyprof-metrics-server", daemon=True)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        :return: (host, port)
+        """
+        return self._server.server_address[:2]
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def render(self, path: str, min_total_percent: float = 0., min_parent_percent: float = 0., percentiles=None):
+        """
+        :param path: `/metrics` or `/metrics.json`
+        :param min_total_percent:
+        :param min_parent_percent:
+        :param percentiles: use `self.percentiles` if None
+        :return: (content type, body), or None if the path is unknown
+        """
+        if percentiles is None:
+            percentiles = self.percentiles
+        with self._lock:
+            if path == "/metrics":
+                return "text/plain; version=0.0.4; charset=utf-8", report_prometheus(
+                    min_total_percent, min_parent_percent, percentiles, prefix=self.prefix,
+                )
+            if path == "/metrics.json":
+                return "application/json", report_json(min_total_percent, min_parent_percent, percentiles)
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                try:
+                    min_total_percent = float(query.get("min_total_percent", ["0"])[-1])
+                    min_parent_percent = float(query.get("min_parent_percent", ["0"])[-1])
+                    percentiles = [
+                        float(_) for _ in query["percentiles"][-1].split(",") if _
+                    ] if "percentiles" in query else None
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                ret = server.render(
+                    url.path,
+                    min_total_percent=min_total_percent,
+                    min_parent_percent=min_parent_percent,
+                    percentiles=percentiles,
+                )
+                if ret is None:
+                    self.send_error(404)
+                    return
+                content_type, body = ret
+                body = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+__all__ = ["MetricsServer"]
@@ -0,0 +1,270 @@
+from math import ceil, log, inf
+from typing import List, Dict, Any, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# batches at least this large are counted with numpy if available
+VECTORIZE_THRESHOLD = 64
+
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch in the style of DDSketch.
+
+    Values are counted in logarithmically sized buckets, so that any quantile is estimated with a relative error
+    of at most `relative_accuracy`.
+    Negative values (e.g., the net allocated bytes) are counted by their magnitudes in a mirrored sketch.
+    The buckets are kept in a dense list of at most `max_buckets` entries.
+    When the values span more buckets than that, the lowest buckets are collapsed,
+    which only affects the accuracy of the lowest quantiles.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        :param relative_accuracy: the relative error bound of quantiles, in (0, 1)
+        :param max_buckets:
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy should be in (0, 1), got {relative_accuracy}")
+        if max_buckets < 1:
+            raise ValueError(f"max_buckets should be positive, got {max_buckets}")
+        self._relative_accuracy = relative_accuracy
+        self._max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._multiplier = 1 / log(self._gamma)
+        # values smaller than this are counted as zeros
+        self._min_indexable = 1e-9
+        self._buckets: List[int] = []
+        self._offset = 0  # the key of self._buckets[0]
+        self._zero_count = 0
+        self._count = 0
+        self._min = inf
+        self._max = -inf
+        # the magnitudes of the negative values, created at the first one
+        self._negative: Optional["QuantileSketch"] = None
+
+    @property
+    def relative_accuracy(self) -> float:
+        return self._relative_accuracy
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def min(self) -> float:
+        return self._min if self._count > 0 else 0
+
+    @property
+    def max(self) -> float:
+        return self._max if self._count > 0 else 0
+
+    def _key(self, value: float) -> int:
+        return ceil(log(value) * self._multiplier)
+
+    def _value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def _extend(self, min_key: int, max_key: int):
+        """
+        Make sure that keys in [min_key, max_key] are covered by self._buckets, collapsing the lowest ones if necessary
+        """
+        if not self._buckets:
+            self._offset = min_key
+            self._buckets = [0] * (max_key - min_key + 1)
+        else:
+            if min_key < self._offset:
+                self._buckets[:0] = [0] * (self._offset - min_key)
+                self._offset = min_key
+            if max_key >= self._offset + len(self._buckets):
+                self._buckets.extend([0] * (max_key - self._offset - len(self._buckets) + 1))
+        excess = len(self._buckets) - self._max_buckets
+        if excess > 0:
+            self._buckets[:excess + 1] = [sum(self._buckets[:excess + 1])]
+            self._offset += excess
+
+    def add(self, value: float):
+        """
+        Count a value
+        :param value:
+        :return:
+        """
+        self._count += 1
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+        if value <= self._min_indexable:
+            if value < -self._min_indexable:
+                self._negative_sketch().add(-value)
+            else:
+                self._zero_count += 1
+            return
+        key = self._key(value)
+        idx = key - self._offset
+        if not 0 <= idx < len(self._buckets):
+            self._extend(key, key)
+            idx = max(key - self._offset, 0)
+        self._buckets[idx] += 1
+
+    def extend(self, values: Sequence[float]):
+        """
+        Count a batch of values
+        :param values:
+        :return:
+        """
+        if len(values) == 0:
+            return
+        if np is not None and len(values) >= VECTORIZE_THRESHOLD:
+            self._extend_vectorized(np.asarray(values, dtype=np.float64))
+            return
+        self._count += len(values)
+        self._min = min(self._min, min(values))
+        self._max = max(self._max, max(values))
+        multiplier, min_indexable = self._multiplier, self._min_indexable
+        keys = [ceil(log(_) * multiplier) for _ in values if _ > min_indexable]
+        self._zero_count += len(values) - len(keys)
+        if self._min < -min_indexable:
+            negatives = [-_ for _ in values if _ < -min_indexable]
+            if negatives:
+                self._zero_count -= len(negatives)
+                self._negative_sketch().extend(negatives)
+        if not keys:
+            return
+        self._extend(min(keys), max(keys))
+        buckets, offset = self._buckets, self._offset
+        for key in keys:
+            buckets[key - offset if key >= offset else 0] += 1
+
+    def _extend_vectorized(self, values: "np.ndarray"):
+        self._count += len(values)
+        self._min = min(self._min, values.min().item())
+        self._max = max(self._max, values.max().item())
+        n_values = len(values)
+        if self._min < -self._min_indexable:
+            negatives = (-values[values < -self._min_indexable]).tolist()
+            if negatives:
+                n_values -= len(negatives)
+                self._negative_sketch().extend(negatives)
+        values = values[values > self._min_indexable]
+        self._zero_count += n_values - len(values)
+        if len(values) == 0:
+            return
+        keys = np.ceil(np.log(values) * self._multiplier).astype(np.int64)
+        min_key, max_key = keys.min().item(), keys.max().item()
+        self._extend(min_key, max_key)
+        counts = np.bincount(keys - min_key).tolist()
+        start = min_key - self._offset
+        if start < 0:  # the lowest keys are collapsed
+            self._buckets[0] += sum(counts[:-start])
+            counts, start = counts[-start:], 0
+        buckets = self._buckets
+        for idx, count in enumerate(counts, start):
+            if count:
+                buckets[idx] += count
+
+    def _negative_sketch(self) -> "QuantileSketch":
+        if self._negative is None:
+            self._negative = QuantileSketch(self._relative_accuracy, self._max_buckets)
+        return self._negative
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-quantile of all the counted values in O(number of buckets)
+        :param q: in [0, 1]
+        :return:
+        """
+        if self._count == 0:
+            return 0
+        if q <= 0:
+            return self._min
+        if q >= 1:
+            return self._max
+        rank = q * (self._count - 1)
+        accumulated = 0
+        negative = self._negative
+        if negative is not None:
+            # from the largest magnitude down
+            for idx in range(len(negative._buckets) - 1, -1, -1):
+                accumulated += negative._buckets[idx]
+                if accumulated > rank:
+                    return min(max(-negative._value(idx + negative._offset), self._min), self._max)
+        accumulated += self._zero_count
+        if accumulated > rank:
+            return min(max(0., self._min), self._max)
+        for idx, bucket in enumerate(self._buckets):
+            accumulated += bucket
+            if accumulated > rank:
+                return min(max(self._value(idx + self._offset), self._min), self._max)
+        return self._max
+
+    def check_mergeable(self, other: "QuantileSketch"):
+        """
+        :param other:
+        :raise ValueError: if the other sketch cannot be merged, i.e., its relative accuracy is different
+        """
+        if other._gamma != self._gamma:
+            raise ValueError(
+                f"cannot merge sketches with different relative accuracy: "
+                f"{self._relative_accuracy} and {other._relative_accuracy}"
+            )
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        Count all the values counted by another sketch, which must have the same relative accuracy
+        :param other:
+        :return: self
+        """
+        self.check_mergeable(other)
+        if other._count == 0:
+            return self
+        self._count += other._count
+        self._zero_count += other._zero_count
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+        if other._negative is not None:
+            self._negative_sketch().merge(other._negative)
+        if other._buckets:
+            self._extend(other._offset, other._offset + len(other._buckets) - 1)
+            for idx, bucket in enumerate(other._buckets):
+                self._buckets[max(idx + other._offset - self._offset, 0)] += bucket
+        return self
+
+    def copy(self) -> "QuantileSketch":
+        ret = QuantileSketch(self._relative_accuracy, self._max_buckets)
+        return ret.merge(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a JSON-serializable representation
+        """
+        return {
+            "relative_accuracy": self._relative_accuracy,
+            "max_buckets": self._max_buckets,
+            "offset": self._offset,
+            "buckets": list(self._buckets),
+            "zero_count": self._zero_count,
+            "min": self.min,
+            "max": self.max,
+            "negative": self._negative.to_dict() if self._negative is not None else None,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "QuantileSketch":
+        ret = QuantileSketch(data["relative_accuracy"], data["max_buckets"])
+        ret._offset = data["offset"]
+        ret._buckets = list(data["buckets"])
+        ret._zero_count = data["zero_count"]
+        ret._count = ret._zero_count + sum(ret._buckets)
+        if data.get("negative") is not None:
+            ret._negative = QuantileSketch.from_dict(data["negative"])
+            ret._count += ret._negative.count
+        if ret._count > 0:
+            ret._min, ret._max = data["min"], data["max"]
+        return ret
+
+
+__all__ = ["QuantileSketch"]
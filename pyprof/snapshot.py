@@ -0,0 +1,155 @@
+import json
+import os
+from io import StringIO
+from typing import Dict, Any, Union, TextIO, Iterable, List, Optional, Tuple
+
+from .pyprof import Profiler, _format_report_header, _format_report_row
+from .sketch import QuantileSketch
+from .statistics import StreamingStatistics
+
+SNAPSHOT_VERSION = 1
+
+
+def _snapshot_node(profiler: Profiler, reset: bool) -> Dict[str, Any]:
+    # noinspection PyProtectedMember
+    if reset:
+        statistics, untimed_count = profiler._reset()
+    else:
+        statistics, untimed_count = profiler._statistics, profiler.untimed_count
+    # noinspection PyProtectedMember
+    return {
+        "name": profiler.name,
+        "streaming": profiler.streaming,
+        "statistics": statistics.to_dict(),
+        "untimed_count": untimed_count,
+        "children": [_snapshot_node(child, reset) for child in sorted(list(profiler._children), key=lambda _: _.name)],
+    }
+
+
+def snapshot(reset: bool = False) -> Dict[str, Any]:
+    """
+    Take a compact, JSON-serializable snapshot of the whole Profiler tree.
+    For each Profiler, it contains the count, total, mean, the sum of squared differences from the mean
+    and the quantile sketch (which tracks min and max), but never the elapsed times.
+    :param reset: atomically reset each Profiler after taking its statistics,
+        so that the next snapshot covers only what is recorded in between
+    :return:
+    """
+    return {"version": SNAPSHOT_VERSION, "root": _snapshot_node(Profiler.get(""), reset)}
+
+
+def _check_node(profiler: Profiler, node: Dict[str, Any]):
+    """
+    :raise ValueError: if the statistics of the node or its descendants cannot be merged into the existing Profilers
+    """
+    relative_accuracy = node["statistics"]["sketch"]["relative_accuracy"]
+    # noinspection PyProtectedMember
+    profiler._merged_statistics.sketch.check_mergeable(QuantileSketch(relative_accuracy))
+    for child in node["children"]:
+        existing = Profiler._instances.get(f"{profiler.full_path}/{child['name']}")
+        if existing is not None:
+            _check_node(existing, child)
+
+
+def _merge_node(profiler: Profiler, node: Dict[str, Any]):
+    # noinspection PyProtectedMember
+    profiler._merge_statistics(StreamingStatistics.from_dict(node["statistics"]), node["untimed_count"])
+    for child in node["children"]:
+        _merge_node(
+            Profiler(
+                child["name"], profiler,
+                streaming=child["streaming"],
+                relative_accuracy=child["statistics"]["sketch"]["relative_accuracy"],
+            ),
+            child,
+        )
+
+
+def merge_snapshot(*snapshots: Dict[str, Any]):
+    """
+    Merge snapshots, e.g., taken in other processes, into the Profiler tree of this process,
+    so that `report()` covers all of them.
+    Each snapshot is merged entirely or not at all.
+    :param snapshots:
+    :return:
+    :raise ValueError: if a snapshot has an unsupported version,
+        or a Profiler in it has a different relative accuracy from the existing one of the same path
+    """
+    for _ in snapshots:
+        if _.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version: {_.get('version')}")
+        _check_node(Profiler.get(""), _["root"])
+        _merge_node(Profiler.get(""), _["root"])
+
+
+def report_snapshot(data: Dict[str, Any], min_total_percent: float = 0., min_parent_percent: float = 0.) -> str:
+    """
+    Format a snapshot in the same way as `report()`
+    :param data:
+    :param min_total_percent:
+    :param min_parent_percent:
+    :return:
+    """
+    # (full path, total of the parent, statistics, count, total) in the order of report()
+    rows: List[Tuple[str, float, StreamingStatistics, int, float]] = []
+
+    def collect(node: Dict[str, Any], parent_path: Optional[str], parent_total: Optional[float]):
+        statistics = StreamingStatistics.from_dict(node["statistics"])
+        count = statistics.count + node["untimed_count"]
+        total = statistics.total if node["untimed_count"] == 0 else statistics.average * count
+        full_path = node["name"] if parent_path is None else f"{parent_path}/{node['name']}"
+        rows.append((full_path, total if parent_total is None else parent_total, statistics, count, total))
+        for child in node["children"]:
+            collect(child, full_path, total)
+
+    collect(data["root"], None, None)
+    full_path_width = max(len(_[0]) for _ in rows)
+    root_total = rows[0][-1]
+    with StringIO() as ret:
+        print(_format_report_header(full_path_width), file=ret, end="")
+        for full_path, parent_total, statistics, count, total in rows:
+            total_percent = total / max(root_total, 1e-4) * 100
+            parent_percent = total / max(parent_total, 1e-4) * 100
+            if total_percent >= min_total_percent * 100 and parent_percent >= min_parent_percent * 100:
+                print(_format_report_row(
+                    full_path, full_path_width, total_percent, parent_percent, count, total,
+                    statistics.average, statistics.standard_deviation, statistics.min_time, statistics.max_time,
+                ), file=ret)
+        return ret.getvalue()
+
+
+def dump_snapshot(file: Union[str, os.PathLike, TextIO]):
+    """
+    Write a snapshot of the Profiler tree as JSON into a file object (e.g., a pipe) or a path.
+    A path is replaced atomically, so that the readers of a shared directory never see partial snapshots.
+    :param file:
+    :return:
+    """
+    if hasattr(file, "write"):
+        json.dump(snapshot(), file, separators=(",", ":"))
+        return
+    tmp_path = f"{os.fspath(file)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot(), f, separators=(",", ":"))
+    os.replace(tmp_path, file)
+
+
+def load_snapshot(*files: Union[str, os.PathLike, TextIO]):
+    """
+    Merge the snapshots written by `dump_snapshot` into the Profiler tree of this process
+    :param files: file objects or paths
+    :return:
+    """
+    merge_snapshot(*_read_snapshots(files))
+
+
+def _read_snapshots(files: Iterable[Union[str, os.PathLike, TextIO]]):
+    for file in files:
+        if hasattr(file, "read"):
+            yield json.load(file)
+        else:
+            with open(file, "r") as f:
+                yield json.load(f)
+
+
+__all__ = ["snapshot", "merge_snapshot", "report_snapshot", "dump_snapshot", "load_snapshot"]
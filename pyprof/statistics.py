@@ -0,0 +1,266 @@
+from array import array
+from math import sqrt, ceil
+from typing import List, Dict, Any, Sequence
+
+from .sketch import QuantileSketch, VECTORIZE_THRESHOLD
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class StreamingStatistics:
+    """
+    Statistics of tic-toc-pairs kept online in O(1) memory.
+    count/total/mean/variance are updated by Welford's algorithm,
+    and min/max/quantiles are read from a fixed-size QuantileSketch.
+    No elapsed time is kept.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        :param relative_accuracy: the relative error bound of `tail`
+        """
+        self._count = 0
+        self._total = 0.
+        self._mean = 0.
+        self._m2 = 0.
+        self._sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, elapsed_time: float):
+        """
+        Record the elapsed time of a tic-toc-pair
+        :param elapsed_time:
+        :return:
+        """
+        self._count += 1
+        self._total += elapsed_time
+        delta = elapsed_time - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (elapsed_time - self._mean)
+        self._sketch.add(elapsed_time)
+
+    def extend(self, elapsed_times: Sequence[float]):
+        """
+        Record the elapsed times of a batch of tic-toc-pairs, with vectorized operations if numpy is available
+        :param elapsed_times:
+        :return:
+        """
+        self.extend_online(elapsed_times)
+
+    def extend_online(self, elapsed_times: Sequence[float]):
+        """
+        Record a batch of tic-toc-pairs in the online statistics only, i.e., without keeping their elapsed times
+        even in SampleStatistics
+        :param elapsed_times:
+        :return:
+        """
+        count = len(elapsed_times)
+        if count == 0:
+            return
+        if np is not None and count >= VECTORIZE_THRESHOLD:
+            elapsed_times = np.asarray(elapsed_times, dtype=np.float64)
+            total = elapsed_times.sum().item()
+            mean = total / count
+            m2 = np.square(elapsed_times - mean).sum().item()
+        else:
+            total = sum(elapsed_times)
+            mean = total / count
+            m2 = sum([(_ - mean) ** 2 for _ in elapsed_times])
+        self._merge_moments(count, total, mean, m2)
+        self._sketch.extend(elapsed_times)
+
+    def _merge_moments(self, count: int, total: float, mean: float, m2: float):
+        """
+        Chan et al.'s parallel algorithm
+        """
+        merged_count = self._count + count
+        if merged_count == 0:
+            return
+        delta = mean - self._mean
+        self._m2 += m2 + delta * delta * self._count * count / merged_count
+        self._mean += delta * count / merged_count
+        self._total += total
+        self._count = merged_count
+
+    def merge(self, other: "StreamingStatistics") -> "StreamingStatistics":
+        """
+        Add the statistics of another set of tic-toc-pairs, which are left unchanged if they cannot be merged
+        :param other:
+        :return: self
+        :raise ValueError: if the sketch of the other has a different relative accuracy
+        """
+        self._sketch.check_mergeable(other._sketch)
+        self._merge_moments(other._count, other._total, other._mean, other._m2)
+        self._sketch.merge(other._sketch)
+        return self
+
+    def empty_like(self) -> "StreamingStatistics":
+        """
+        :return: empty statistics of the same kind and accuracy
+        """
+        return type(self)(self._sketch.relative_accuracy)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a JSON-serializable representation, which never includes the elapsed times
+        """
+        return {
+            "count": self._count,
+            "total": self._total,
+            "mean": self._mean,
+            "m2": self._m2,
+            "sketch": self._sketch.to_dict(),
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "StreamingStatistics":
+        sketch = QuantileSketch.from_dict(data["sketch"])
+        ret = StreamingStatistics(sketch.relative_accuracy)
+        ret._count, ret._total, ret._mean, ret._m2 = data["count"], data["total"], data["mean"], data["m2"]
+        ret._sketch = sketch
+        return ret
+
+    @property
+    def times(self) -> List[float]:
+        raise RuntimeError("elapsed times are not kept in streaming mode")
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    @property
+    def average(self) -> float:
+        return self._mean
+
+    @property
+    def standard_deviation(self) -> float:
+        if self._count == 0:
+            return 0
+        return sqrt(max(self._m2, 0.) / self._count)
+
+    @property
+    def sketch(self) -> QuantileSketch:
+        return self._sketch
+
+    @property
+    def min_time(self) -> float:
+        return self._sketch.min
+
+    @property
+    def max_time(self) -> float:
+        return self._sketch.max
+
+    def tail(self, percentile: float) -> float:
+        return self._sketch.quantile(percentile * 0.01)
+
+
+class SampleStatistics(StreamingStatistics):
+    """
+    StreamingStatistics which additionally keeps every elapsed time in a compact array of doubles
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        super().__init__(relative_accuracy)
+        self._elapsed_times = array('d')
+        self._sorted_elapsed_times = None
+
+    def add(self, elapsed_time: float):
+        super().add(elapsed_time)
+        self._elapsed_times.append(elapsed_time)
+        self._sorted_elapsed_times = None
+
+    def extend(self, elapsed_times: Sequence[float]):
+        super().extend(elapsed_times)
+        self._elapsed_times.extend(elapsed_times)
+        self._sorted_elapsed_times = None
+
+    def merge(self, other: "StreamingStatistics") -> "StreamingStatistics":
+        super().merge(other)
+        if isinstance(other, SampleStatistics):
+            self._elapsed_times.extend(other._elapsed_times)
+            self._sorted_elapsed_times = None
+        return self
+
+    @property
+    def times(self) -> Sequence[float]:
+        """
+        :return: a copy of the elapsed times, since the array cannot grow while its buffer is exported
+            (e.g., viewed by numpy)
+        """
+        return self._elapsed_times[:]
+
+    @property
+    def sorted_times(self) -> Sequence[float]:
+        if self._sorted_elapsed_times is None:
+            if np is not None:
+                self._sorted_elapsed_times = np.sort(np.frombuffer(self._elapsed_times, dtype=np.float64))
+            else:
+                self._sorted_elapsed_times = sorted(self._elapsed_times)
+        return self._sorted_elapsed_times
+
+
+class RollingStatistics:
+    """
+    StreamingStatistics of the recent tic-toc-pairs in a ring of time buckets, which takes constant memory
+    """
+
+    def __init__(self, span: float = 900., resolution: float = 10., relative_accuracy: float = 0.01):
+        """
+        :param span: the max length of windows in seconds
+        :param resolution: the length of each time bucket in seconds
+        :param relative_accuracy:
+        """
+        if not 0 < resolution <= span:
+            raise ValueError(f"resolution should be in (0, span], got resolution={resolution} span={span}")
+        self._resolution = resolution
+        self._relative_accuracy = relative_accuracy
+        n_buckets = ceil(span / resolution)
+        self._bucket_indices: List[int] = [-1] * n_buckets
+        self._buckets: List[StreamingStatistics] = [StreamingStatistics(relative_accuracy) for _ in range(n_buckets)]
+
+    @property
+    def span(self) -> float:
+        return self._resolution * len(self._buckets)
+
+    def extend(self, timestamps_and_elapsed_times: List[float]):
+        """
+        Record a batch of tic-toc-pairs
+        :param timestamps_and_elapsed_times: timestamps (in perf_counter) and elapsed times, interleaved
+        :return:
+        """
+        batches: Dict[int, List[float]] = {}
+        for timestamp, elapsed_time in zip(timestamps_and_elapsed_times[::2], timestamps_and_elapsed_times[1::2]):
+            batches.setdefault(int(timestamp // self._resolution), []).append(elapsed_time)
+        for index, elapsed_times in batches.items():
+            slot = index % len(self._buckets)
+            if self._bucket_indices[slot] > index:  # too old
+                continue
+            if self._bucket_indices[slot] < index:
+                self._bucket_indices[slot] = index
+                self._buckets[slot] = StreamingStatistics(self._relative_accuracy)
+            self._buckets[slot].extend(elapsed_times)
+
+    def window(self, seconds: float, now: float) -> StreamingStatistics:
+        """
+        :param seconds: the length of the window, limited to `span`.
+            It is made of n = ceil(seconds / resolution) time buckets including the ongoing one, which has only
+            partly elapsed, so it covers between the last (n - 1) * resolution and n * resolution seconds.
+        :param now: in perf_counter
+        :return: the statistics of the tic-toc-pairs in the window
+        """
+        now_index = int(now // self._resolution)
+        n_buckets = max(ceil(seconds / self._resolution), 1)
+        ret = StreamingStatistics(self._relative_accuracy)
+        for index, bucket in zip(self._bucket_indices, self._buckets):
+            if now_index - n_buckets < index <= now_index:
+                ret.merge(bucket)
+        return ret
+
+
+__all__ = ["StreamingStatistics", "SampleStatistics", "RollingStatistics"]
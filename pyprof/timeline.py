@@ -0,0 +1,126 @@
+import json
+import os
+import time
+from collections import deque
+from threading import get_ident, current_thread
+from typing import Dict, Iterator, List, Tuple, Union, TextIO
+
+from .pyprof import Profiler
+from .trace import _read_trace
+
+
+class SpanRecorder:
+    """
+    Keep the last `max_spans` timed tic-toc-pairs of all Profilers in memory as spans,
+    with their start timestamps and thread ids, so that they can be exported as a timeline
+    (see `export_chrome_trace`).
+    """
+
+    def __init__(self, max_spans: int = 1 << 20):
+        """
+        :param max_spans: older spans are dropped once there are more than this
+        """
+        if max_spans <= 0:
+            raise ValueError(f"max_spans should be positive, got {max_spans}")
+        # (full path, thread id, start in perf_counter, duration)
+        self._spans: deque = deque(maxlen=max_spans)
+        self._thread_names: Dict[int, str] = {}
+        self._epoch_offset = time.time() - time.perf_counter()
+
+    def start(self) -> "SpanRecorder":
+        Profiler._span_sinks += (self,)
+        return self
+
+    def stop(self):
+        Profiler._span_sinks = tuple(_ for _ in Profiler._span_sinks if _ is not self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __len__(self):
+        return len(self._spans)
+
+    def write(self, full_path: str, end: float, duration: float, implicit_parent: bool = False):
+        thread_id = get_ident()
+        if thread_id not in self._thread_names:
+            self._thread_names[thread_id] = current_thread().name
+        self._spans.append((full_path, thread_id, end - duration, duration))
+
+    def spans(self) -> List[Tuple[str, int, float, float]]:
+        """
+        :return: the recorded spans as (full path, thread id, start in Unix time, duration)
+        """
+        return [
+            (full_path, thread_id, start + self._epoch_offset, duration)
+            for full_path, thread_id, start, duration in list(self._spans)
+        ]
+
+    @property
+    def thread_names(self) -> Dict[int, str]:
+        return dict(self._thread_names)
+
+
+def export_chrome_trace(file: Union[str, os.PathLike, TextIO], source: Union[SpanRecorder, str, os.PathLike]):
+    """
+    Write spans as Chrome Trace Event JSON, which can be opened in Perfetto (ui.perfetto.dev) or chrome://tracing.
+    The events are written one by one, without building the whole document in memory.
+    :param file: a file object or a path
+    :param source: a SpanRecorder, or the path of a file written by TraceLog
+    :return:
+    """
+    if hasattr(file, "write"):
+        _write_chrome_trace(file, source)
+    else:
+        with open(file, "w") as f:
+            _write_chrome_trace(f, source)
+
+
+def _iter_spans(source: Union[SpanRecorder, str, os.PathLike]) -> Tuple[Iterator[Tuple[str, int, float, float]], int]:
+    """
+    :return: an iterator of (full path, thread id, start in Unix time, duration), and the process id
+    """
+    if isinstance(source, SpanRecorder):
+        # one snapshot, since the deque may be appended meanwhile, whose spans are converted one by one
+        # noinspection PyProtectedMember
+        epoch_offset = source._epoch_offset
+        return (
+            (full_path, thread_id, start + epoch_offset, duration)
+            # noinspection PyProtectedMember
+            for full_path, thread_id, start, duration in list(source._spans)
+        ), os.getpid()
+    paths, records, pid = _read_trace(source)
+    return (
+        (paths[path_id], thread_id, start, duration)
+        for path_id, thread_id, start, duration in zip(
+            records["path_id"].tolist(), records["thread_id"].tolist(),
+            records["start"].tolist(), records["duration"].tolist(),
+        )
+    ), pid
+
+
+def _write_chrome_trace(f: TextIO, source: Union[SpanRecorder, str, os.PathLike]):
+    spans, pid = _iter_spans(source)
+    f.write('{"displayTimeUnit":"ms","traceEvents":[')
+    separator = ""
+    for full_path, thread_id, start, duration in spans:
+        f.write(separator)
+        separator = ",\n"
+        json.dump({
+            "name": full_path.rsplit("/", 1)[-1], "cat": "pyprof", "ph": "X",
+            "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": thread_id,
+            "args": {"path": full_path},
+        }, f, separators=(",", ":"))
+    thread_names = source.thread_names if isinstance(source, SpanRecorder) else {}
+    for thread_id, name in thread_names.items():
+        f.write(separator)
+        separator = ",\n"
+        json.dump({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": name},
+        }, f, separators=(",", ":"))
+    f.write("]}\n")
+
+
+__all__ = ["SpanRecorder", "export_chrome_trace"]
@@ -0,0 +1,209 @@
+import mmap
+import os
+import time
+import warnings
+from itertools import count
+from struct import Struct
+from threading import Lock, get_ident
+from typing import Dict, List, Optional, Tuple, Union
+
+from .pyprof import Profiler
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+TRACE_MAGIC = b"PYPROFTR"
+TRACE_VERSION = 1
+# magic, version, record size, capacity, path table size, used bytes of the path table,
+# the offset from perf_counter to the Unix time, and the process id
+_HEADER = Struct("<8sIIQQQdQ")
+_HEADER_SIZE = 64
+# the length of a full path in the path table
+_PATH_LENGTH = Struct("<I")
+# sequence number (starting from 1, 0 for an empty slot), path id, flags, thread id, start (perf_counter), duration
+_RECORD = Struct("<QIIQdd")
+# the parent was not in tic, so that the tic-toc-pair is also counted in all the ancestors
+FLAG_IMPLICIT_PARENT = 1
+
+TRACE_DTYPE = None if np is None else np.dtype([
+    ("seq", "<u8"), ("path_id", "<u4"), ("flags", "<u4"), ("thread_id", "<u8"), ("start", "<f8"), ("duration", "<f8"),
+])
+
+
+class TraceLog:
+    """
+    Write every timed tic-toc-pair of all Profilers as a fixed-width binary record into a memory-mapped ring file,
+    which keeps the last `capacity` ones.
+    A record is written by packing it into the mapped memory, without any Python-level I/O or lock.
+    The full paths are written into a path table at the head of the file when they are first seen.
+
+    Use `read_trace` or `load_trace` to analyze the file offline.
+    """
+
+    def __init__(self, file: Union[str, os.PathLike], capacity: int = 1 << 20, path_table_size: int = 1 << 20):
+        """
+        :param file: the path of the ring file, which is overwritten
+        :param capacity: the max number of records, each of which takes 40 bytes
+        :param path_table_size: the max total size of the full paths in bytes
+        """
+        if capacity <= 0:
+            raise ValueError(f"capacity should be positive, got {capacity}")
+        self.file = file
+        self.capacity = capacity
+        self.path_table_size = path_table_size
+        self._records_offset = _HEADER_SIZE + path_table_size
+        self._path_ids: Dict[str, int] = {}
+        self._path_table_used = 0
+        # guards the path table
+        self._lock = Lock()
+        self._seq = count(1)
+        self._mmap: Optional[mmap.mmap] = None
+
+    def start(self) -> "TraceLog":
+        size = self._records_offset + self.capacity * _RECORD.size
+        with open(self.file, "w+b") as f:
+            f.truncate(size)
+            self._mmap = mmap.mmap(f.fileno(), size)
+        self._write_header()
+        Profiler._span_sinks += (self,)
+        return self
+
+    def stop(self):
+        """
+        Stop writing records, and flush and close the file
+        :return:
+        """
+        Profiler._span_sinks = tuple(_ for _ in Profiler._span_sinks if _ is not self)
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _write_header(self):
+        _HEADER.pack_into(
+            self._mmap, 0, TRACE_MAGIC, TRACE_VERSION, _RECORD.size, self.capacity, self.path_table_size,
+            self._path_table_used, time.time() - time.perf_counter(), os.getpid(),
+        )
+
+    def _register(self, full_path: str) -> Optional[int]:
+        with self._lock:
+            if full_path in self._path_ids:
+                return self._path_ids[full_path]
+            encoded = full_path.encode()
+            if self._path_table_used + _PATH_LENGTH.size + len(encoded) > self.path_table_size:
+                warnings.warn(f"the path table of {self.file} is full, {full_path!r} is not traced")
+                return None
+            offset = _HEADER_SIZE + self._path_table_used
+            _PATH_LENGTH.pack_into(self._mmap, offset, len(encoded))
+            self._mmap[offset + _PATH_LENGTH.size:offset + _PATH_LENGTH.size + len(encoded)] = encoded
+            self._path_table_used += _PATH_LENGTH.size + len(encoded)
+            self._write_header()
+            path_id = self._path_ids[full_path] = len(self._path_ids)
+            return path_id
+
+    def write(self, full_path: str, end: float, duration: float, implicit_parent: bool = False):
+        """
+        :param full_path:
+        :param end: the perf_counter at toc
+        :param duration:
+        :param implicit_parent: whether the parent was not in tic
+        :return:
+        """
+        path_id = self._path_ids.get(full_path)
+        if path_id is None:
+            path_id = self._register(full_path)
+            if path_id is None:
+                return
+        seq = next(self._seq)
+        try:
+            _RECORD.pack_into(
+                self._mmap, self._records_offset + (seq - 1) % self.capacity * _RECORD.size,
+                seq, path_id, FLAG_IMPLICIT_PARENT if implicit_parent else 0, get_ident(), end - duration, duration,
+            )
+        except ValueError:  # stopped concurrently
+            pass
+
+
+def read_trace(file: Union[str, os.PathLike]) -> Tuple[List[str], "np.ndarray"]:
+    """
+    Read a file written by TraceLog. numpy is required.
+    :param file:
+    :return: the full paths (indexed by path id),
+        and the records in the order of writing as a structured array of `TRACE_DTYPE`,
+        where `start` is converted to Unix time
+    """
+    paths, records, _ = _read_trace(file)
+    return paths, records
+
+
+def _read_trace(file: Union[str, os.PathLike]) -> Tuple[List[str], "np.ndarray", int]:
+    """
+    :return: the full paths, the records and the process id
+    """
+    if np is None:
+        raise ImportError("numpy is required to read traces")
+    with open(file, "rb") as f:
+        header = f.read(_HEADER_SIZE)
+        (
+            magic, version, record_size, capacity, path_table_size, path_table_used, epoch_offset, pid,
+        ) = _HEADER.unpack_from(header)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION or record_size != _RECORD.size:
+            raise ValueError(f"unsupported trace file: {file}")
+        path_table = f.read(path_table_used)
+    paths = []
+    offset = 0
+    while offset < len(path_table):
+        length, = _PATH_LENGTH.unpack_from(path_table, offset)
+        offset += _PATH_LENGTH.size
+        paths.append(path_table[offset:offset + length].decode())
+        offset += length
+    records = np.memmap(file, dtype=TRACE_DTYPE, mode="r", offset=_HEADER_SIZE + path_table_size, shape=(capacity,))
+    records = records[records["seq"] > 0]
+    records = records[np.argsort(records["seq"], kind="stable")]
+    records["start"] += epoch_offset
+    return paths, records, pid
+
+
+def load_trace(file: Union[str, os.PathLike]):
+    """
+    Rebuild the statistics of a file written by TraceLog, and merge them into the Profiler tree of this process.
+    numpy is required.
+    :param file:
+    :return:
+    """
+    paths, records = read_trace(file)
+    order = np.argsort(records["path_id"], kind="stable")
+    path_ids, starts = np.unique(records["path_id"][order], return_index=True)
+    durations = np.split(records["duration"][order], starts[1:])
+    implicit = np.split((records["flags"][order] & FLAG_IMPLICIT_PARENT) != 0, starts[1:])
+    # the durations of each path, and those which are also counted in the ancestors
+    own = {paths[path_id]: _ for path_id, _ in zip(path_ids.tolist(), durations)}
+    inherited = {paths[path_id]: d[i] for path_id, d, i in zip(path_ids.tolist(), durations, implicit) if i.any()}
+    for full_path in sorted(set(own) | {_[:i] for _ in own for i in range(len(_)) if _[i] == "/"}):
+        parts = [own[full_path]] if full_path in own else []
+        parts.extend(d for descendant, d in inherited.items() if descendant.startswith(full_path + "/"))
+        if not parts:
+            continue
+        profiler = _get_or_create(full_path)
+        # noinspection PyProtectedMember
+        statistics = profiler._merged_statistics.empty_like()
+        statistics.extend(np.concatenate(parts))
+        # noinspection PyProtectedMember
+        profiler._merge_statistics(statistics)
+
+
+def _get_or_create(full_path: str) -> Profiler:
+    if full_path in Profiler._instances:
+        return Profiler.get(full_path)
+    parent_path, name = full_path.rsplit("/", 1)
+    return Profiler(name, _get_or_create(parent_path))
+
+
+__all__ = ["TraceLog", "read_trace", "load_trace", "TRACE_DTYPE"]
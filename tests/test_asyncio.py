@@ -0,0 +1,74 @@
+import asyncio
+import contextvars
+import random
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from pyprof import profile, Profiler, clean, current_profiler
+from .test_utils import close
+
+
+def test_asyncio_nesting():
+    clean()
+
+    @profile
+    async def handler(i):
+        assert current_profiler().full_path == "/serve/test_asyncio_nesting.<locals>.handler"
+        with profile("db"):
+            await asyncio.sleep(random.uniform(0.01, 0.03))
+            assert current_profiler().full_path == "/serve/test_asyncio_nesting.<locals>.handler/db"
+        await asyncio.sleep(0.01)
+        return i
+
+    @profile("serve")
+    async def serve(n):
+        return await asyncio.gather(*[handler(i) for i in range(n)])
+
+    n_tasks = 2000
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert asyncio.run(serve(n_tasks)) == list(range(n_tasks))
+
+    assert current_profiler() is None
+    p_serve = Profiler.get("/serve")
+    p_handler = Profiler.get("/serve/test_asyncio_nesting.<locals>.handler")
+    p_db = Profiler.get("/serve/test_asyncio_nesting.<locals>.handler/db")
+    assert p_serve.count == 1
+    assert p_handler.count == n_tasks
+    assert p_db.count == n_tasks
+    assert p_db.min_time >= 0.01
+    assert p_handler.total >= p_db.total + n_tasks * 0.01
+    assert p_handler.max_time <= p_serve.total
+    assert set(Profiler._instances) == {"", "/serve", p_handler.full_path, p_db.full_path}
+
+
+def test_asyncio_profiler_decorator():
+    clean()
+    p = Profiler("p")
+
+    @p
+    async def f():
+        await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*[f() for _ in range(100)])
+
+    asyncio.run(main())
+    assert p.count == 100
+    # the 100 sleeps all wake in one loop iteration, so later ones are delayed by the others' exits
+    assert p.min_time >= 0.01
+    assert close(p.min_time, 0.01)
+
+
+def test_context_does_not_grow_with_profilers():
+    clean()
+
+    def serve():
+        for i in range(1000):
+            with profile(f"route:{i}"):
+                pass
+        return len(contextvars.copy_context())
+
+    # each thread starts with an empty context
+    n_vars = [ThreadPoolExecutor(1).submit(serve).result() for _ in range(2)]
+    assert n_vars[0] == n_vars[1] <= 2
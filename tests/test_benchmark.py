@@ -0,0 +1,76 @@
+import json
+import tracemalloc
+
+from pyprof import Profiler, clean, monitoring
+from pyprof.benchmark import BENCHMARKS, run_benchmarks, compare, main, bench_decorator, bench_memory
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(quick=True, repeat=1)
+    assert {_["name"] for _ in results["results"]} == set(BENCHMARKS)
+    for result in results["results"]:
+        assert result["unit"] in ("s", "B")
+        assert result["value"] == min(result["repeats"])
+        assert result["value"] == result["value"]  # not nan
+    depths = {_["params"]["depth"] for _ in results["results"] if _["name"] == "tic_toc"}
+    assert depths == {1, 10}
+    # the benchmarks leave no Profiler behind
+    assert list(Profiler._instances) == [""]
+    json.dumps(results)
+
+
+def test_compare():
+    baseline = {"results": [
+        {"name": "tic_toc", "params": {"depth": 1}, "value": 1e-6},
+        {"name": "report", "params": {"nodes": 100}, "value": 1e-3},
+        {"name": "removed", "params": {}, "value": 1.},
+    ]}
+    current = {"results": [
+        {"name": "report", "params": {"nodes": 100}, "value": 1.05e-3},
+        {"name": "tic_toc", "params": {"depth": 1}, "value": 2e-6},
+        {"name": "added", "params": {}, "value": 1.},
+    ]}
+    rows = compare(baseline, current, threshold=0.1)
+    assert [(_["key"], _["regression"]) for _ in rows] == [
+        ('report{"nodes": 100}', False),
+        ('tic_toc{"depth": 1}', True),
+    ]
+    assert rows[1]["ratio"] == 2.
+
+
+def test_main(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    assert main(["--quick", "--repeat", "1", "--only", "tic_toc", "report", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert {_["name"] for _ in results["results"]} == {"tic_toc", "report"}
+    # compared with itself
+    assert main(["--quick", "--repeat", "1", "--only", "memory", "--baseline", str(output)]) == 0
+    assert json.loads(capsys.readouterr().out)["results"][0]["name"] == "memory"
+
+
+def test_benchmark_backends(monkeypatch):
+    clean()
+    registered = []
+    register = monitoring.register
+
+    def spy(func, proxy):
+        ret = register(func, proxy)
+        registered.append(ret)
+        return ret
+
+    monkeypatch.setattr(monitoring, "register", spy)
+    bench_decorator(10, 1)
+    # the function of the monitoring backend is not a closure, so it is registered indeed
+    assert registered == ([True] if monitoring.AVAILABLE else [])
+    clean()
+
+
+def test_bench_memory_keeps_tracing():
+    tracemalloc.start()
+    try:
+        bench_memory(100, 1)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    bench_memory(100, 1)
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from pyprof import profile, Profiler, clean, report
+
+
+def _busy(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_cpu_clock():
+    clean()
+
+    @profile("busy", cpu_clock="thread")
+    def busy():
+        _busy(5e-3)
+
+    @profile("sleep", cpu_clock="thread")
+    def sleep():
+        time.sleep(5e-3)
+
+    with profile("handler", cpu_clock="process"):
+        for _ in range(20):
+            busy()
+            sleep()
+    p_busy = Profiler.get("/handler/busy")
+    p_sleep = Profiler.get("/handler/sleep")
+    assert p_busy.cpu_clock == "thread"
+    assert p_busy.cpu_statistics.count == 20
+    assert p_busy.cpu_utilization > 0.5
+    assert p_sleep.cpu_utilization < 0.3
+    # the CPU time is measured within the wall time
+    assert p_busy.cpu_total <= p_busy.total
+    assert p_sleep.cpu_statistics.max_time <= p_sleep.max_time
+    handler = Profiler.get("/handler")
+    assert handler.cpu_clock == "process"
+    assert 0.2 < handler.cpu_utilization < 0.8
+
+
+def test_cpu_report():
+    clean()
+    with profile("cpu", cpu_clock="thread"):
+        _busy(1e-2)
+    with profile("wall"):
+        time.sleep(1e-2)
+    lines = report(cpu=True).splitlines()
+    assert lines[0].endswith("|cpu        |%cpu       |")
+    cpu_row = next(_ for _ in lines if _.startswith("|/cpu"))
+    wall_row = next(_ for _ in lines if _.startswith("|/wall"))
+    assert cpu_row.endswith("%|")
+    assert wall_row.endswith(f"|{'':11}|{'':11}|")
+    assert all(len(_) == len(lines[0]) for _ in lines)
+    # the columns are off by default
+    assert "%cpu" not in report()
+
+
+def test_cpu_sampling_and_defaults():
+    clean()
+    with pytest.raises(ValueError):
+        Profiler("bad", cpu_clock="wall")
+    with pytest.raises(RuntimeError):
+        Profiler("none").cpu_statistics
+
+    @profile("hot", sample_rate=0.25, cpu_clock="thread")
+    def hot():
+        pass
+
+    for _ in range(100):
+        hot()
+    # untimed entries have no CPU time either
+    assert Profiler.get("/hot").cpu_statistics.count == Profiler.get("/hot").timed_count == 25
+
+    Profiler.default_cpu_clock = "process"
+    try:
+        assert Profiler("default").cpu_clock == "process"
+        assert Profiler("disabled", cpu_clock="").cpu_clock is None
+    finally:
+        Profiler.default_cpu_clock = None
@@ -0,0 +1,118 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pyprof import profile, Profiler, clean, report, report_prometheus, OTHER, snapshot, merge_snapshot
+from pyprof.statistics import StreamingStatistics
+
+
+@pytest.fixture(autouse=True)
+def limited():
+    clean()
+    Profiler.max_profilers = 20
+    yield
+    Profiler.max_profilers = None
+    Profiler.fold_evicted = True
+    clean()
+
+
+def _request(route: str):
+    with profile("api"):
+        with profile(f"route:{route}"):
+            pass
+
+
+def test_eviction():
+    for i in range(100):
+        _request(str(i))
+        _request("hot")
+    assert len(Profiler._instances) <= 20 + 1  # and the bucket
+    assert Profiler.evicted_count > 0
+    api = Profiler.get("/api")
+    # the hot path is never the least recently used
+    assert Profiler.get("/api/route:hot").count == 100
+    assert Profiler.get("/api/route:99").count == 1
+    # the evicted tic-toc-pairs are folded into the bucket, and still counted in the parent
+    bucket = Profiler.get(f"/api/{OTHER}")
+    assert bucket.streaming
+    assert api.count == 200
+    assert sum(_.count for _ in api._children) == 200
+    assert bucket.count == Profiler.evicted_count
+    lines = report().splitlines()
+    assert any(_.startswith(f"|/api/{OTHER}") for _ in lines)
+    assert lines[-1] == f"{Profiler.evicted_count} Profilers evicted (see Profiler.max_profilers)"
+    assert f"pyprof_evicted_profilers_total {Profiler.evicted_count}\n" in report_prometheus()
+
+
+def test_eviction_keeps_active_and_parents():
+    Profiler.fold_evicted = False
+    with profile("long") as long:
+        for i in range(50):
+            _request(str(i))
+        # the Profiler in tic is not evicted
+        assert Profiler.get("/long") is long
+        assert Profiler.get("/long/api").count == 50
+    assert long.count == 1
+    assert f"/long/api/{OTHER}" not in Profiler._instances
+    assert Profiler.get("/long/api/route:49").count == 1
+
+
+def test_unlimited():
+    Profiler.max_profilers = None
+    for i in range(100):
+        _request(str(i))
+    assert len(Profiler._instances) == 102
+    assert Profiler.evicted_count == 0
+    assert "evicted" not in report()
+
+
+def test_eviction_mixed_accuracy():
+    with profile("api"):
+        for i in range(30):
+            with profile(f"route:{i}", relative_accuracy=0.01 if i % 2 else 0.001):
+                pass
+    api = Profiler.get("/api")
+    # one bucket per relative accuracy, named after it except the first one, so that no tic-toc-pair is dropped
+    buckets = [_ for _ in api._children if _.name.startswith(OTHER)]
+    assert sorted(_.name for _ in buckets) == [OTHER, f"{OTHER}@0.01"]
+    # noinspection PyProtectedMember
+    assert sorted(_._merged_statistics.sketch.relative_accuracy for _ in buckets) == [0.001, 0.01]
+    assert sum(_.count for _ in buckets) == Profiler.evicted_count
+    assert sum(_.count for _ in api._children) == 30
+
+
+def test_merge_incompatible_statistics():
+    statistics = StreamingStatistics(0.01)
+    statistics.extend([1., 2., 3.])
+    other = StreamingStatistics(0.001)
+    other.extend([10.])
+    with pytest.raises(ValueError):
+        statistics.merge(other)
+    # unchanged
+    assert statistics.count == 3 and statistics.total == 6. and statistics.max_time == 3.
+
+    Profiler.max_profilers = None
+    with profile("a", relative_accuracy=0.001):
+        with profile("b", relative_accuracy=0.001):
+            pass
+    data = snapshot()
+    clean()
+    with profile("a", relative_accuracy=0.001):
+        with profile("b"):
+            pass
+    # the snapshot is merged entirely or not at all
+    with pytest.raises(ValueError):
+        merge_snapshot(data)
+    assert Profiler.get("/a").count == 1 and Profiler.get("/a/b").count == 1
+
+
+def test_eviction_bounds_context():
+    def serve():
+        for i in range(2000):
+            _request(str(i))
+        return len(contextvars.copy_context())
+
+    # the dynamic Profilers leave nothing in the context of the thread
+    assert ThreadPoolExecutor(1).submit(serve).result() <= 2
+    assert len(Profiler._instances) <= 20 + 1
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from pyprof import profile, Profiler, clean, current_profiler
+from pyprof import propagate_profiler, ProfiledThreadPoolExecutor, ProfiledProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from .test_utils import close
+
+
+@profile
+def f():
+    time.sleep(0.01)
+    return current_profiler().full_path
+
+
+def test_profiled_thread_pool_executor():
+    clean()
+    with profile("pool"):
+        with ProfiledThreadPoolExecutor(max_workers=8) as executor:
+            paths = list(executor.map(lambda _: f(), range(32)))
+    assert set(paths) == {"/pool/f"}
+    assert Profiler.get("/pool").count == 1
+    assert Profiler.get("/pool/f").count == 32
+    assert close(Profiler.get("/pool/f").average, 0.01)
+    assert Profiler.get("/pool").total < Profiler.get("/pool/f").total
+    assert "/f" not in Profiler._instances
+
+
+def test_propagate_profiler():
+    clean()
+    with profile("outer"):
+        with profile("inner"):
+            func = propagate_profiler(f)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(func) for _ in range(4)]
+            bare = executor.submit(f).result()
+    assert [_.result() for _ in futures] == ["/outer/inner/f"] * 4
+    assert bare == "/f"
+    assert Profiler.get("/outer/inner/f").count == 4
+
+
+def test_profiled_process_pool_executor():
+    clean()
+    with profile("pool"):
+        with ProfiledProcessPoolExecutor(max_workers=2) as executor:
+            paths = [executor.submit(f).result() for _ in range(4)]
+    assert paths == ["/pool/f"] * 4
+    # the Profilers recorded in the worker processes are merged back
+    assert Profiler.get("/pool").count == 1
+    assert Profiler.get("/pool/f").count == 4
+    assert close(Profiler.get("/pool/f").average, 0.01)
+
+
+def test_profiled_process_pool_executor_unmergeable():
+    clean()
+    with profile("pool"):
+        Profiler("f", current_profiler(), relative_accuracy=0.001)
+        with ProfiledProcessPoolExecutor(max_workers=1) as executor:
+            with pytest.warns(UserWarning, match="not merged"):
+                # the task still completes
+                assert executor.submit(f).result() == "/pool/f"
+    assert Profiler.get("/pool/f").count == 0
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+import numpy as np
+
+from pyprof import Profiler, clean, report_json, report_csv, report_prometheus
+from .test_utils import close
+
+
+def _record_tree():
+    clean()
+    p1 = Profiler("p1")
+    p2 = Profiler('p"2', p1)
+    p3 = Profiler("p3", p1)
+    p1.tic()
+    for t in np.linspace(1e-3, 1e-2, 100):
+        # noinspection PyProtectedMember
+        p2._record(t)
+    # noinspection PyProtectedMember
+    p3._record(1e-4)
+    p1.toc()
+    # noinspection PyProtectedMember
+    p1._record(1.)
+    return p1, p2, p3
+
+
+def test_report_json():
+    p1, p2, p3 = _record_tree()
+    rows = json.loads(report_json(percentiles=(50, 99.9)))
+    assert [_["path"] for _ in rows] == ["", "/p1", '/p1/p"2', "/p1/p3"]
+    row = rows[2]
+    assert row["count"] == p2.count == 100
+    assert close(row["total"], p2.total)
+    assert close(row["mean"], p2.average)
+    assert close(row["std"], p2.standard_deviation)
+    assert row["min"] == p2.min_time and row["max"] == p2.max_time
+    assert row["p50"] == p2.tail(50) and row["p99.9"] == p2.tail(99.9)
+
+    assert [_["path"] for _ in json.loads(report_json(min_total_percent=0.1))] == ["", "/p1", '/p1/p"2']
+    assert [_["path"] for _ in json.loads(report_json(min_parent_percent=0.6))] == ["", "/p1"]
+
+
+def test_report_csv():
+    p1, p2, p3 = _record_tree()
+    rows = list(csv.DictReader(io.StringIO(report_csv(percentiles=(99,)))))
+    assert list(rows[0]) == ["path", "count", "total", "mean", "std", "min", "max", "p99"]
+    assert [_["path"] for _ in rows] == ["", "/p1", '/p1/p"2', "/p1/p3"]
+    assert int(rows[3]["count"]) == 1
+    assert float(rows[3]["p99"]) == p3.tail(99)
+
+
+def test_report_prometheus():
+    p1, p2, p3 = _record_tree()
+    text = report_prometheus(min_total_percent=0.1, percentiles=(50, 99))
+    assert '# TYPE pyprof_seconds summary' in text
+    assert f'pyprof_seconds_count{{path="/p1/p\\"2"}} {p2.count}\n' in text
+    assert f'pyprof_seconds{{path="/p1",quantile="0.99"}} {p1.tail(99)!r}\n' in text
+    assert f'pyprof_seconds_max{{path="/p1"}} {p1.max_time!r}\n' in text
+    assert "/p1/p3" not in text
+    # the samples of a metric family are contiguous
+    families = [
+        _.split("{")[0].replace("_seconds_sum", "_seconds").replace("_seconds_count", "_seconds")
+        for _ in text.splitlines() if not _.startswith("#")
+    ]
+    assert len(set(families)) == sum(1 for a, b in zip([None] + families, families) if a != b)
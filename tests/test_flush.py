@@ -26,3 +26,39 @@ def test_flush():
     assert Profiler("p1").count == 3
     g()
     assert Profiler("p1").count == 1
+
+
+def h():
+    with profile("child"):
+        pass
+
+
+def test_flush_decorated_function():
+    clean()
+    flushed = profile(h, flush=True)
+    for _ in range(3):
+        flushed()
+    # flushed at every call
+    assert Profiler.get("/h").count == 1
+    assert Profiler.get("/h/child").count == 1
+
+
+def test_cached_profiler_invalidation():
+    clean()
+    proxy = profile("child")
+    with profile("parent"):
+        with proxy:
+            pass
+    child = Profiler.get("/parent/child")
+    with profile("parent", flush=True):
+        with proxy as p:
+            pass
+    assert p is Profiler.get("/parent/child")
+    assert p is not child
+    assert p.count == 1
+
+    clean()
+    with proxy as p:
+        pass
+    assert p is Profiler.get("/child")
+    assert p.count == 1
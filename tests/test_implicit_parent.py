@@ -0,0 +1,102 @@
+from threading import Thread
+
+import numpy as np
+
+from pyprof import Profiler, clean
+from .test_utils import close
+
+
+def test_deep_implicit_parent():
+    clean()
+    depth, n = 50, 3 * Profiler.buffer_size
+    profilers = [Profiler("p0")]
+    for i in range(1, depth):
+        profilers.append(Profiler(f"p{i}", profilers[-1]))
+    times = np.abs(np.random.normal(1e-3, 1e-4, n))
+    for t in times:
+        # noinspection PyProtectedMember
+        profilers[-1]._record(t)
+    # the ancestors are not touched on toc
+    # noinspection PyProtectedMember
+    assert all(not _._thread_buffers for _ in profilers[:-1])
+    for p in profilers + [Profiler.get("")]:
+        assert p.count == n
+        assert close(p.total, np.sum(times).item())
+        assert p.max_time == np.max(times).item()
+    assert np.array_equal(np.sort(profilers[-1].times), np.sort(times))
+    # the elapsed times of the descendants are only folded into the statistics of the ancestors
+    assert all(len(_.times) == 0 for _ in profilers[:-1])
+
+
+# noinspection PyProtectedMember
+def test_implicit_parent_bounded():
+    clean()
+    n = 10 * Profiler.buffer_size
+    p1 = Profiler("p1", windowed=True)
+    p2 = Profiler("p2", p1)
+    p3 = Profiler("p3", p2)
+    for i in range(n):
+        p3.tic(timed=i % 3 != 0)
+        p3.toc()
+    # no ancestor is read, but the outgoing tic-toc-pairs are passed on once they fill a buffer
+    for p in (p1, p2, p3):
+        assert len(p._outgoing_elapsed_times) < Profiler.buffer_size
+        assert sum(len(_.outgoing_buffer or ()) for _ in p._thread_buffers) < 2 * Profiler.buffer_size
+    root = Profiler.get("")
+    assert len(root._outgoing_elapsed_times) == 0
+    for p in (p1, p2, root):
+        assert p.count == n
+        assert p.untimed_count == p3.untimed_count
+    assert p1.window(60).count == p3.timed_count
+
+
+def test_implicit_parent_in_tic():
+    clean()
+    p1 = Profiler("p1")
+    p2 = Profiler("p2", p1)
+    p3 = Profiler("p3", p2)
+    p1.tic()
+    for _ in range(10):
+        p3.tic()
+        p3.toc()
+    # p3 is recorded while p2 is not in tic, so it is also counted in p2 and all the ancestors of p2
+    assert p2.count == 10
+    assert p1.count == 10
+    p1.toc()
+    assert p1.count == 11
+    assert Profiler.get("").count == 11
+
+
+def test_implicit_parent_untimed_and_windowed():
+    clean()
+    p1 = Profiler("p1", windowed=True)
+    p2 = Profiler("p2", p1)
+    for i in range(10):
+        p2.tic(timed=i % 2 == 0)
+        p2.toc()
+    assert p1.count == 10
+    assert p1.timed_count == p1.untimed_count == 5
+    assert p1.window(60).count == 5
+
+
+def test_implicit_parent_threads():
+    clean()
+    n_threads, n_times = 8, 2000
+    p1 = Profiler("p1")
+    leaves = [Profiler(f"p{i}", Profiler("p", p1)) for i in range(n_threads)]
+
+    def record(p):
+        for _ in range(n_times):
+            p.tic()
+            p.toc()
+
+    threads = [Thread(target=record, args=(_,)) for _ in leaves]
+    for _ in threads:
+        _.start()
+    while any(_.is_alive() for _ in threads):
+        assert p1.count <= n_threads * n_times
+    for _ in threads:
+        _.join()
+    assert p1.count == n_threads * n_times
+    assert Profiler.get("/p1/p").count == n_threads * n_times
+    assert Profiler.get("").count == n_threads * n_times
@@ -0,0 +1,47 @@
+from pyprof import Profiler, clean, report, snapshot, report_snapshot
+
+
+def test_incremental_report():
+    clean()
+    a = Profiler("a")
+    b = Profiler("b", a)
+    c = Profiler("c")
+    for p in [a, b, c]:
+        with p:
+            pass
+    assert report() == report_snapshot(snapshot())
+    # noinspection PyProtectedMember
+    assert not any(_._row_dirty or _._subtree_dirty for _ in [Profiler.get(""), a, b, c])
+
+    with b:
+        pass
+    # noinspection PyProtectedMember
+    assert b._row_dirty and b._subtree_dirty and a._subtree_dirty and Profiler.get("")._subtree_dirty
+    # noinspection PyProtectedMember
+    assert not c._row_dirty and not c._subtree_dirty
+    assert report() == report_snapshot(snapshot())
+    assert f"|{b.count:8}|" in report()
+
+    # new Profilers are added to the report
+    d = Profiler("d", c)
+    with d:
+        pass
+    assert report() == report_snapshot(snapshot())
+    assert len(report().splitlines()) == 6
+
+    # Profilers whose children are flushed
+    Profiler("c", flush=True)
+    assert report() == report_snapshot(snapshot())
+    assert len(report().splitlines()) == 5
+
+
+def test_full_path_width():
+    clean()
+    Profiler("a_very_long_name", Profiler("p"))
+    assert len(report().splitlines()[0]) == len(report().splitlines()[-1])
+    long_width = len(report().splitlines()[0])
+    clean()
+    Profiler("short", Profiler("p"))
+    assert len(report().splitlines()[0]) == len(report().splitlines()[-1]) < long_width
+    Profiler("a_very_long_name", Profiler("p"))
+    assert len(report().splitlines()[0]) == long_width
@@ -0,0 +1,99 @@
+import importlib
+import sys
+import textwrap
+
+import pytest
+
+from pyprof import Profiler, clean, instrument
+
+_MODULE_A = '''
+from . import b
+
+
+def f():
+    for _ in range(3):
+        g()
+    return C().m() + C.s() + C.c()
+
+
+def g():
+    return b.h()
+
+
+def skipped():
+    pass
+
+
+class C:
+    def m(self):
+        return 1
+
+    @staticmethod
+    def s():
+        return 2
+
+    @classmethod
+    def c(cls):
+        return 3
+
+    def __eq__(self, other):
+        return True
+'''
+
+_MODULE_B = '''
+def h():
+    return 0
+'''
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    name = "pyprof_instrumented_package"
+    (tmp_path / name).mkdir()
+    (tmp_path / name / "__init__.py").write_text("")
+    (tmp_path / name / "a.py").write_text(textwrap.dedent(_MODULE_A))
+    (tmp_path / name / "b.py").write_text(textwrap.dedent(_MODULE_B))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    for module in [_ for _ in sys.modules if _ == name or _.startswith(f"{name}.")]:
+        del sys.modules[module]
+
+
+def test_instrument(package):
+    clean()
+    pkg = importlib.import_module(package)
+    original_f = importlib.import_module(f"{package}.b").h
+    instrumentation = instrument(pkg, exclude=f"{package}.a.skipped")
+    # imported after instrument
+    a = importlib.import_module(f"{package}.a")
+    assert a.f() == 6
+    a.skipped()
+    assert a.C() == 1
+    assert Profiler.get("/f").count == 1
+    assert Profiler.get("/f/g").count == 3
+    assert Profiler.get("/f/g/h").count == 3
+    assert Profiler.get("/f/C.m").count == 1
+    assert Profiler.get("/f/C.s").count == 1
+    assert Profiler.get("/f/C.c").count == 1
+    assert "/skipped" not in Profiler._instances
+    assert not any("__eq__" in _ for _ in Profiler._instances)
+
+    instrumentation.uninstall()
+    assert importlib.import_module(f"{package}.b").h is original_f
+    assert isinstance(vars(a.C)["s"], staticmethod)
+    clean()
+    assert a.f() == 6
+    assert list(Profiler._instances) == [""]
+
+
+def test_instrument_sample_rate(package):
+    clean()
+    a = importlib.import_module(f"{package}.a")
+    with instrument(f"{package}.a", include=f"{package}.a.*", sample_rate={"*.g": 0.5}):
+        a.f()
+        a.f()
+    assert Profiler.get("/f").timed_count == 2
+    assert Profiler.get("/f/g").timed_count == 3
+    assert Profiler.get("/f/g").count == 6
+    # b is not instrumented
+    assert "/f/g/h" not in Profiler._instances
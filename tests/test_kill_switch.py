@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import warnings
+
+import pytest
+
+from pyprof import profile, Profiler, clean, enable, disable, is_enabled, current_profiler
+from pyprof.prof_proxy import ProfilerProxy
+
+
+@pytest.fixture(autouse=True)
+def enabled():
+    clean()
+    yield
+    enable()
+    Profiler._disabled_paths.clear()
+
+
+def test_global_switch():
+    @profile("f")
+    def f():
+        return 1
+
+    disable()
+    assert not is_enabled() and not is_enabled("/f")
+    assert f() == 1
+    with profile("block") as p:
+        # an empty Profiler out of the tree
+        assert p.count == 0 and p.total == 0
+        assert current_profiler() is None
+    p_direct = Profiler("direct")
+    with p_direct:
+        pass
+    assert "/f" not in Profiler._instances and "/block" not in Profiler._instances
+    assert p_direct.count == 0
+    assert p.count == 0 and "disabled" not in Profiler._instances
+
+    enable()
+    assert is_enabled()
+    assert f() == 1
+    with profile("block"):
+        pass
+    assert Profiler.get("/f").count == 1
+    assert Profiler.get("/block").count == 1
+
+
+def test_created_while_disabled():
+    disable()
+    # a lightweight proxy, which does not build a ProfilerProxy until enabled
+    assert not isinstance(profile("block"), ProfilerProxy)
+    proxy = profile("reused")
+
+    @profile("g")
+    def g():
+        with proxy:
+            pass
+
+    g()
+    with proxy as p:
+        assert p.count == 0
+    assert "/g" not in Profiler._instances and "/reused" not in Profiler._instances
+    with pytest.raises(ValueError):
+        profile("block", sample_rate=0)
+
+    enable()
+    g()
+    with proxy:
+        pass
+    assert Profiler.get("/g").count == 1
+    assert Profiler.get("/g/reused").count == 1
+    assert Profiler.get("/reused").count == 1
+
+
+def test_subtree_switch():
+    @profile("b")
+    def b():
+        pass
+
+    disable("/a")
+    assert is_enabled() and not is_enabled("/a") and not is_enabled("/a/b") and is_enabled("/c")
+    with profile("a"):
+        b()
+    with profile("c"):
+        b()
+    # the nested Profilers are still resolved under the disabled one, and are disabled as well
+    assert Profiler.get("/a").count == 0
+    assert Profiler.get("/a/b").count == 0
+    assert "/b" not in Profiler._instances
+    assert Profiler.get("/c/b").count == 1
+
+    enable("/a")
+    with profile("a"):
+        b()
+    assert Profiler.get("/a").count == 1
+    assert Profiler.get("/a/b").count == 1
+
+
+def test_switch_within_span():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with profile("outer"):
+            disable()
+        enable()
+        with profile("outer"):
+            with profile("inner"):
+                pass
+            disable("/outer")
+        enable("/outer")
+    assert Profiler.get("/outer").count == 0
+    assert Profiler.get("/outer/inner").count == 1
+    assert current_profiler() is None
+    # the dropped tic does not keep the parent in tic
+    assert not Profiler.get("/outer")._active
+
+
+def test_environment_variable():
+    output = subprocess.check_output(
+        [sys.executable, "-c", "import pyprof; print(pyprof.is_enabled())"],
+        env={**os.environ, "PYPROF_ENABLED": "0"}, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    assert output.strip() == b"False"
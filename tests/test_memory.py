@@ -0,0 +1,113 @@
+import tracemalloc
+from threading import Thread
+
+import pytest
+
+from pyprof import profile, Profiler, clean, report
+
+MB = 1 << 20
+
+
+@pytest.fixture(autouse=True)
+def stop_tracemalloc():
+    clean()
+    yield
+    tracemalloc.stop()
+
+
+def test_memory():
+    kept = []
+
+    @profile("keep", memory=True)
+    def keep():
+        kept.append(bytearray(MB))
+
+    @profile("churn", memory=True)
+    def churn():
+        del bytearray(MB)[:]
+
+    with profile("outer", memory=True):
+        for _ in range(5):
+            keep()
+            churn()
+        assert tracemalloc.is_tracing()
+    # started by the first tic, and stopped once no span is open
+    assert not tracemalloc.is_tracing()
+    p_keep = Profiler.get("/outer/keep")
+    p_churn = Profiler.get("/outer/churn")
+    assert p_keep.memory
+    assert p_keep.memory_net_statistics.count == 5
+    assert 0.95 * MB <= p_keep.memory_net_statistics.average < 1.1 * MB
+    assert 0.95 * MB <= p_keep.memory_peak_statistics.average < 1.1 * MB
+    assert abs(p_churn.memory_net_statistics.average) < 0.1 * MB
+    assert 0.95 * MB <= p_churn.memory_peak_statistics.average < 1.1 * MB
+    # the peaks of the children are folded into the open parent
+    outer = Profiler.get("/outer")
+    assert 4.9 * MB <= outer.memory_net_statistics.total < 5.5 * MB
+    assert 5.9 * MB <= outer.memory_peak_statistics.max_time < 6.5 * MB
+    # only the timed pairs of Profilers measuring memory allocations are counted
+    with pytest.raises(RuntimeError):
+        Profiler("none").memory_net_statistics
+
+
+def test_memory_negative_net():
+    tracemalloc.start()
+    kept = [bytearray(MB) for _ in range(5)]
+
+    @profile("free", memory=True)
+    def free():
+        kept.pop()
+
+    for _ in range(5):
+        free()
+    net = Profiler.get("/free").memory_net_statistics
+    # the quantiles of negative values are estimated as accurately as those of positive ones
+    assert -1.1 * MB < net.min_time <= net.tail(50) <= net.max_time < -0.9 * MB
+    assert abs(net.tail(50) - net.average) < 0.02 * MB
+    # not started by pyprof, so not stopped
+    assert tracemalloc.is_tracing()
+
+
+def test_memory_threads():
+    @profile("alloc", memory=True)
+    def alloc():
+        return bytearray(MB)
+
+    def work():
+        for _ in range(20):
+            alloc()
+
+    with profile("outer", memory=True):
+        threads = [Thread(target=work) for _ in range(4)]
+        for _ in threads:
+            _.start()
+        for _ in threads:
+            _.join()
+    p = Profiler.get("/alloc")
+    assert p.memory_net_statistics.count == 80
+    # the spans of each thread see at least their own peak
+    assert p.memory_peak_statistics.min_time >= 0.95 * MB
+    assert Profiler.get("/outer").memory_peak_statistics.max_time >= 0.95 * MB
+
+
+def test_memory_report():
+    with profile("alloc", memory=True):
+        _ = bytearray(MB)
+    with profile("plain"):
+        pass
+    lines = report(memory=True).splitlines()
+    assert lines[0].endswith("|net/call   |peak/call  |")
+    assert all(len(_) == len(lines[0]) for _ in lines)
+    row = next(_ for _ in lines if _.startswith("|/alloc"))
+    assert int(row.split("|")[-3].rstrip("B")) >= 0.95 * MB
+    assert next(_ for _ in lines if _.startswith("|/plain")).endswith(f"|{'':11}|{'':11}|")
+    assert "net/call" not in report()
+
+
+def test_memory_tracemalloc_stopped():
+    p = Profiler("stopped", memory=True)
+    p.tic()
+    tracemalloc.stop()
+    p.toc()
+    assert p.count == 1
+    assert p.memory_net_statistics.count == 0
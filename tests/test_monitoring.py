@@ -0,0 +1,119 @@
+from threading import Thread
+
+import pytest
+
+from pyprof import profile, Profiler, clean
+from pyprof import monitoring
+from pyprof.prof_proxy import ProfilerProxy
+
+requires_monitoring = pytest.mark.skipif(not monitoring.AVAILABLE, reason="sys.monitoring requires Python 3.12+")
+
+
+# module-level functions, whose code objects are not shared
+def f(n):
+    if n > 0:
+        return f(n - 1) + g()
+    return 0
+
+
+def g():
+    return 1
+
+
+def h():
+    raise ValueError()
+
+
+def make_closure():
+    def closure():
+        return 1
+
+    return closure
+
+
+@requires_monitoring
+def test_monitoring_backend(monkeypatch):
+    clean()
+    monkeypatch.setattr(ProfilerProxy, "use_monitoring", True)
+    try:
+        # not wrapped
+        assert profile(f) is f and profile(g) is g and profile(h) is h
+        assert f(2) == 2
+        assert Profiler.get("/f").count == 1
+        assert Profiler.get("/f/f").count == 1
+        assert Profiler.get("/f/f/f").count == 1
+        assert Profiler.get("/f/f/g").count == 1
+        assert Profiler.get("/f/g").count == 1
+
+        with profile("p"):
+            for _ in range(3):
+                with pytest.raises(ValueError):
+                    h()
+            threads = [Thread(target=g) for _ in range(4)]
+            for _ in threads:
+                _.start()
+            for _ in threads:
+                _.join()
+        assert Profiler.get("/p/h").count == 3
+        assert Profiler.get("/g").count == 4
+        assert ProfilerProxy.active_proxy.get() == ()
+
+        # decorated again, the code object is already registered, so it is wrapped and timed only by the wrapper
+        wrapped_g = profile("wrapped")(g)
+        assert wrapped_g is not g
+        assert wrapped_g() == 1
+        assert Profiler.get("/wrapped").count == 1
+        assert "/wrapped/g" not in Profiler._instances
+        assert Profiler.get("/g").count == 4
+    finally:
+        for _ in (f, g, h):
+            monitoring.unregister(_)
+    assert not monitoring.unregister(g)
+    g()
+    assert Profiler.get("/g").count == 4
+
+
+@requires_monitoring
+def test_monitoring_closure(monkeypatch):
+    clean()
+    monkeypatch.setattr(ProfilerProxy, "use_monitoring", True)
+    # the closures created by each call share a code object, so they are wrapped
+    closures = [profile(make_closure()) for _ in range(2)]
+    assert all(hasattr(_, "__wrapped__") for _ in closures)
+    assert not monitoring.is_registered(closures[0])
+    for closure in closures:
+        assert closure() == 1
+    assert Profiler.get("/make_closure.<locals>.closure").count == 2
+    assert set(Profiler._instances) == {"", "/make_closure.<locals>.closure"}
+
+
+@requires_monitoring
+def test_monitoring_default():
+    clean()
+    # on by default on Python 3.12+, for module-level functions only
+    assert ProfilerProxy.use_monitoring
+    try:
+        assert profile(g) is g
+        closure = make_closure()
+        assert profile(closure) is not closure
+        assert g() == 1
+        assert Profiler.get("/g").count == 1
+    finally:
+        monitoring.unregister(g)
+
+
+def test_monitoring_fallback(monkeypatch):
+    clean()
+    monkeypatch.setattr(ProfilerProxy, "use_monitoring", False)
+
+    @profile
+    def f():
+        return 1
+
+    @profile
+    def g():
+        yield 1
+
+    assert hasattr(f, "__wrapped__") and hasattr(g, "__wrapped__")
+    assert f() == 1
+    assert Profiler.get("/test_monitoring_fallback.<locals>.f").count == 1
@@ -1,6 +1,10 @@
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, current_thread
 
-from pyprof import profile, Profiler
+from pyprof import profile, Profiler, clean
+from pyprof.prof_proxy import ProfilerProxy
 
 real_time = 0.
 
@@ -24,5 +28,103 @@ def test_overhead():
     print(f'average overhead={average_overhead * 1000:.4f}ms')
 
 
+class LockedProfiler:
+    """
+    Mimic the previous implementation, in which every tic and toc takes a global lock
+    """
+    _lock = Lock()
+
+    def __init__(self):
+        self._tics = {}
+        self._elapsed_times = []
+
+    def tic(self):
+        with self._lock:
+            self._tics[current_thread()] = time.perf_counter()
+
+    def toc(self):
+        with self._lock:
+            self._elapsed_times.append(time.perf_counter() - self._tics[current_thread()])
+            del self._tics[current_thread()]
+
+    @property
+    def average(self) -> float:
+        return sum(self._elapsed_times) / len(self._elapsed_times)
+
+
+def _multi_thread_time(profiler, n_threads: int, n_times: int) -> float:
+    def work():
+        for _ in range(n_times):
+            profiler.tic()
+            profiler.toc()
+
+    tic = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        for _ in range(n_threads):
+            executor.submit(work)
+    return time.perf_counter() - tic
+
+
+def test_multi_thread_overhead():
+    """
+    Time empty tic-toc-pairs in many threads switched every 10us, so that a thread is often switched out
+    while holding the global lock of LockedProfiler, as when the lock is contended.
+    The recorded time of an empty pair is the distortion of the profiler on the measured latencies,
+    which includes the lock waits of LockedProfiler,
+    and the wall time per pair is the cost paid by the profiled threads.
+    The lock-free path does more work per pair, so it is not cheaper in wall time while the lock is not contended.
+    """
+    n_threads, n_times = 32, 2000
+    n_pairs = n_threads * n_times
+    clean()
+    profiler = Profiler("multi-thread")
+    locked_profiler = LockedProfiler()
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        sharded_time = _multi_thread_time(profiler, n_threads, n_times)
+        locked_time = _multi_thread_time(locked_profiler, n_threads, n_times)
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert profiler.count == n_pairs
+    print(f'lock-free: distortion={profiler.average * 1e6:.3f}us wall={sharded_time / n_pairs * 1e6:.3f}us/pair')
+    print(f'locked: distortion={locked_profiler.average * 1e6:.3f}us wall={locked_time / n_pairs * 1e6:.3f}us/pair')
+    # the lock waits are rare but long, so they show in the average
+    assert 2 * profiler.average < locked_profiler.average
+    assert sharded_time / n_pairs < 1e-4  # 0.1ms
+
+
+class UncachedProfilerProxy(ProfilerProxy):
+    """
+    Resolve the Profiler on every entry, as before Profilers were cached per call site
+    """
+
+    def __enter__(self):
+        self._profilers = {}
+        return super().__enter__()
+
+
+def _enter_time(proxy: ProfilerProxy, n_times: int) -> float:
+    tic = time.perf_counter()
+    for _ in range(n_times):
+        with proxy:
+            pass
+    return (time.perf_counter() - tic) / n_times
+
+
+def test_proxy_enter_overhead():
+    clean()
+    n_times = 20000
+    with profile("parent"):
+        cached_time = _enter_time(ProfilerProxy("cached"), n_times)
+        uncached_time = _enter_time(UncachedProfilerProxy("uncached"), n_times)
+    assert Profiler.get("/parent/cached").count == n_times
+    assert Profiler.get("/parent/uncached").count == n_times
+    print(f'enter+exit: cached={cached_time * 1e6:.3f}us uncached={uncached_time * 1e6:.3f}us')
+    assert cached_time < uncached_time
+
+
 if __name__ == '__main__':
     test_overhead()
+    test_multi_thread_overhead()
+    test_proxy_enter_overhead()
@@ -4,6 +4,7 @@ import time
 
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
 from pyprof import clean, Profiler, report
 from .test_utils import close
 
@@ -99,3 +100,55 @@ def test_multi_thread_profiler():
     print(rpt)
     assert len(rpt.splitlines()) == 5 + 1
     assert str(_root_profiler) == '\n'.join(rpt.splitlines()[1:]) + '\n'
+
+
+def test_concurrent_record_and_read():
+    clean()
+    p = Profiler("p")
+    n_threads, n_times = 8, 1000
+
+    def work():
+        for _ in range(n_times):
+            # noinspection PyProtectedMember
+            p._record(1e-3)
+
+    buffer_size = Profiler.buffer_size
+    Profiler.buffer_size = 7
+    try:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            futures = [pool.submit(work) for _ in range(n_threads)]
+            while not all(_.done() for _ in futures):
+                assert p.count <= n_threads * n_times
+    finally:
+        Profiler.buffer_size = buffer_size
+    assert p.count == n_threads * n_times
+    assert len(p.times) == n_threads * n_times
+    assert close(p.total, n_threads * n_times * 1e-3)
+    assert close(p.standard_deviation, 0.)
+
+
+# noinspection PyProtectedMember
+def test_ended_threads():
+    clean()
+    p = Profiler("p", cpu_clock="thread")
+    q = Profiler("q", p)
+    n_threads = 200
+
+    def work(i):
+        for timed in (True, False):
+            q.tic(timed=timed)
+            q.toc()
+        if i % 2 == 0:
+            p.tic()
+            p.toc()
+
+    for i in range(n_threads):
+        thread = Thread(target=work, args=(i,))
+        thread.start()
+        thread.join()
+    # the buffers of the ended threads are folded and dropped, instead of being walked on every merge
+    assert len(p._thread_buffers) == len(q._thread_buffers) == 0
+    assert q.count == 2 * n_threads
+    assert q.untimed_count == n_threads
+    assert p.count == n_threads // 2 + 2 * n_threads
+    assert p.cpu_statistics.count == n_threads // 2
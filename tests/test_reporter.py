@@ -0,0 +1,89 @@
+import time
+from threading import Thread
+
+import pytest
+
+from pyprof import profile, Profiler, clean, report, snapshot, report_snapshot, BackgroundReporter
+
+
+def test_background_reporter():
+    clean()
+    reports = []
+    with BackgroundReporter(0.05, report_printer=reports.append):
+        for _ in range(20):
+            with profile("p"):
+                time.sleep(0.01)
+    assert len(reports) >= 2
+    assert all(_.splitlines()[0].startswith("|path") for _ in reports)
+    assert reports[-1].splitlines()[-1].startswith("|/p")
+    assert Profiler.get("/p").count == 20
+
+    with pytest.raises(ValueError):
+        BackgroundReporter(0)
+
+
+def test_background_reporter_reset():
+    clean()
+    reports = []
+    reporter = BackgroundReporter(10, report_printer=reports.append, reset=True)
+    for _ in range(3):
+        with profile("p"):
+            pass
+    reporter.emit()
+    with profile("p"):
+        pass
+    reporter.emit()
+    assert [int(_.splitlines()[-1].split("|")[4]) for _ in reports] == [3, 1]
+    assert Profiler.get("/p").count == 0
+
+
+def test_snapshot_reset():
+    clean()
+    proxy = profile("p", sample_rate=0.5)
+    for _ in range(4):
+        with proxy:
+            pass
+    data = snapshot()
+    assert report_snapshot(data) == report()
+    assert report_snapshot(data, min_total_percent=1.) == report(min_total_percent=1.)
+    data = snapshot(reset=True)
+    assert data["root"]["children"][0]["statistics"]["count"] == 2
+    assert data["root"]["children"][0]["untimed_count"] == 2
+    p = Profiler.get("/p")
+    assert p.count == 0
+    with proxy:
+        pass
+    assert p.count == 1
+    assert p.untimed_count == 0
+
+
+def test_background_reporter_dynamic_profilers(caplog):
+    clean()
+    reports = []
+    failed = []
+
+    def report_printer(ret):
+        reports.append(ret)
+        if len(reports) == 2:
+            failed.append(ret)
+            raise RuntimeError("the printer fails once")
+
+    def serve(worker):
+        for i in range(2000):
+            with profile(f"worker-{worker}"):
+                with profile(f"route-{i}"):
+                    pass
+
+    with BackgroundReporter(1e-3, report_printer=report_printer):
+        threads = [Thread(target=serve, args=(_,)) for _ in range(4)]
+        for _ in threads:
+            _.start()
+        for _ in threads:
+            _.join()
+        n_reports = len(reports)
+        time.sleep(0.05)
+    # the reporter survives the Profilers created while reporting, and the failing printer
+    assert failed
+    assert [_.exc_info[0] for _ in caplog.records] == [RuntimeError]
+    assert len(reports) > n_reports
+    assert len(report().splitlines()) == 2 + 4 * 2001
@@ -0,0 +1,102 @@
+import time
+from itertools import count
+
+import pytest
+
+from pyprof import profile, Profiler, clean, report, snapshot, merge_snapshot, current_profiler
+from .test_utils import close
+
+
+def test_sample_rate():
+    clean()
+
+    @profile("hot", sample_rate=0.1)
+    def hot():
+        with profile("inner"):
+            time.sleep(2e-3)
+
+    with profile("outer"):
+        for _ in range(200):
+            hot()
+    p_hot = Profiler.get("/outer/hot")
+    p_inner = Profiler.get("/outer/hot/inner")
+    assert p_hot.count == 200
+    assert p_hot.timed_count == 20
+    assert p_hot.untimed_count == 180
+    # nesting is kept in untimed entries
+    assert p_inner.count == 200
+    assert p_inner.timed_count == 200
+    # the total is estimated from the timed entries, which all contain a timed inner entry
+    assert close(p_hot.total, p_hot.average * 200)
+    assert p_hot.min_time >= p_inner.min_time >= 2e-3
+    assert p_hot.total >= 200 * 2e-3
+    assert len(report().splitlines()) == 5
+
+    data = snapshot()
+    clean()
+    merge_snapshot(data)
+    assert Profiler.get("/outer/hot").count == 200
+    assert Profiler.get("/outer/hot").timed_count == 20
+
+    with pytest.raises(ValueError):
+        profile("p", sample_rate=0)
+
+
+def test_sample_rate_untriggered_parent():
+    clean()
+    proxy = profile("p", sample_rate=0.5)
+    for _ in range(2):
+        with proxy:
+            pass
+    # noinspection PyProtectedMember
+    from pyprof.pyprof import _root_profiler
+    assert Profiler.get("/p").count == 2
+    assert _root_profiler.count == 2
+    assert _root_profiler.timed_count == 1
+
+
+def test_sample_rate_leaf():
+    clean()
+
+    @profile("leaf", sample_rate=0.25)
+    def leaf():
+        return current_profiler()
+
+    with profile("outer"):
+        entered = [leaf() for _ in range(100)]
+    p_leaf = Profiler.get("/outer/leaf")
+    # untimed entries read no clock, but are still entered
+    assert entered.count(p_leaf) == 100
+    assert p_leaf.count == 100
+    assert p_leaf.timed_count == 25
+    assert p_leaf.untimed_count == 75
+
+    # untimed entries are counted in the parent when it is not in tic
+    clean()
+    for _ in range(8):
+        leaf()
+    # noinspection PyProtectedMember
+    from pyprof.pyprof import _root_profiler
+    assert Profiler.get("/leaf").count == 8
+    assert _root_profiler.count == 8
+    assert _root_profiler.timed_count == 2
+
+
+def test_sample_rate_tree_shape():
+    clean()
+    calls = count()
+
+    @profile("f", sample_rate=0.5)
+    def f():
+        # only in the second call, which is untimed
+        if next(calls) == 1:
+            with profile("g"):
+                pass
+
+    for _ in range(4):
+        f()
+    # sampling never changes the shape of the tree
+    # noinspection PyProtectedMember
+    assert set(Profiler._instances) == {"", "/f", "/f/g"}
+    assert Profiler.get("/f/g").count == 1
+    assert Profiler.get("").count == 4
@@ -0,0 +1,61 @@
+from pyprof import Profiler, clean, report, self_times, report_folded
+from .test_utils import close
+
+
+def _record_tree():
+    clean()
+    a = Profiler("a")
+    b = Profiler("b", a)
+    c = Profiler("c", b)
+    d = Profiler("d", a)
+    a.tic()
+    b.tic()
+    # noinspection PyProtectedMember
+    c._record(0.3)
+    # noinspection PyProtectedMember
+    b._record(0.5)
+    b.toc()
+    # noinspection PyProtectedMember
+    d._record(0.2)
+    a.toc()
+    # noinspection PyProtectedMember
+    a._record(1.)
+    return a, b, c, d
+
+
+def test_self_time():
+    a, b, c, d = _record_tree()
+    assert close(a.self_time, 0.3)
+    assert close(b.self_time, 0.2)
+    assert close(c.self_time, 0.3)
+    assert close(d.self_time, 0.2)
+    times = self_times()
+    assert set(times) == {"", "/a", "/a/b", "/a/b/c", "/a/d"}
+    for profiler in (a, b, c, d):
+        assert close(times[profiler.full_path], profiler.self_time)
+    # the children run in other threads add up to more than the parent
+    e = Profiler("e")
+    f = Profiler("f", e)
+    e.tic()
+    # noinspection PyProtectedMember
+    f._record(0.5)
+    # noinspection PyProtectedMember
+    f._record(0.5)
+    e.toc()
+    assert e.self_time == self_times()["/e"] == 0.
+
+
+def test_report_folded():
+    _record_tree()
+    # in units of 0.1s, so that the real tic-toc-pairs (and any pause in them) round away
+    assert report_folded(unit=0.1) == "a 3\na;b 2\na;b;c 3\na;d 2\n"
+
+
+def test_report_self_time():
+    _record_tree()
+    lines = report(self_time=True).splitlines()
+    assert "|self       |%self      |" in lines[0]
+    assert all(len(_) == len(lines[0]) for _ in lines)
+    row = next(_ for _ in lines if _.startswith("|/a/b "))
+    assert row.endswith("|     0.200s|     20.00%|")
+    assert "%self" not in report()
@@ -0,0 +1,77 @@
+import json
+from threading import Thread, Event
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from pyprof import profile, clean, MetricsServer
+
+
+def test_metrics_server():
+    clean()
+    stopped = Event()
+
+    def record():
+        while not stopped.is_set():
+            with profile("p"):
+                with profile("q"):
+                    pass
+
+    thread = Thread(target=record)
+    thread.start()
+    try:
+        with MetricsServer() as server:
+            host, port = server.address
+            for _ in range(5):
+                with urlopen(f"http://{host}:{port}/metrics") as response:
+                    assert response.headers["Content-Type"].startswith("text/plain")
+                    text = response.read().decode()
+                assert 'pyprof_seconds_count{path="/p/q"}' in text
+            with urlopen(f"http://{host}:{port}/metrics.json?percentiles=50,99.9&min_parent_percent=0.01") as response:
+                rows = json.loads(response.read())
+            assert [_["path"] for _ in rows] == ["", "/p", "/p/q"]
+            assert "p99.9" in rows[0] and "p90" not in rows[0]
+            with pytest.raises(HTTPError) as e:
+                urlopen(f"http://{host}:{port}/unknown")
+            assert e.value.code == 404
+            with pytest.raises(HTTPError) as e:
+                urlopen(f"http://{host}:{port}/metrics?min_total_percent=x")
+            assert e.value.code == 400
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def test_metrics_server_dynamic_profilers():
+    clean()
+    failures = []
+
+    def record(worker):
+        for i in range(2000):
+            with profile(f"worker-{worker}"):
+                with profile(f"route-{i}"):
+                    pass
+
+    def scrape(url):
+        while any(_.is_alive() for _ in threads):
+            try:
+                with urlopen(url) as response:
+                    response.read()
+            except Exception as e:
+                failures.append(e)
+
+    threads = [Thread(target=record, args=(_,)) for _ in range(4)]
+    with MetricsServer() as server:
+        host, port = server.address
+        scrapers = [
+            Thread(target=scrape, args=(f"http://{host}:{port}{path}",)) for path in ("/metrics", "/metrics.json")
+        ]
+        for _ in threads + scrapers:
+            _.start()
+        for _ in threads + scrapers:
+            _.join()
+        # every scrape succeeds while Profilers are being created
+        assert not failures
+        with urlopen(f"http://{host}:{port}/metrics.json") as response:
+            assert len(json.loads(response.read())) == 1 + 4 * 2001
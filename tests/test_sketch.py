@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from pyprof import Profiler, QuantileSketch, clean
+
+
+def test_quantile_sketch():
+    values = np.random.lognormal(-3, 1, 10000)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for v in values:
+        sketch.add(v)
+    assert sketch.count == len(values)
+    assert sketch.min == np.min(values).item()
+    assert sketch.max == np.max(values).item()
+    for q in [0.01, 0.1, 0.5, 0.9, 0.99]:
+        expected = np.quantile(values, q, method='lower').item()
+        assert abs(sketch.quantile(q) - expected) <= 0.011 * expected
+    assert QuantileSketch().quantile(0.5) == 0
+    with pytest.raises(ValueError):
+        QuantileSketch(relative_accuracy=1.)
+
+
+def test_quantile_sketch_negative():
+    values = np.random.lognormal(10, 1, 10000) * np.random.choice([-1, 0, 1], 10000, p=[0.3, 0.1, 0.6])
+    sketches = [QuantileSketch(), QuantileSketch(), QuantileSketch()]
+    for v in values:
+        sketches[0].add(v.item())
+    sketches[1].extend(values.tolist())
+    for i in range(0, len(values), 50):
+        sketches[2].extend(values[i:i + 50].tolist())
+    merged = QuantileSketch.from_dict(sketches[0].to_dict()).merge(sketches[1])
+    for sketch in sketches + [merged]:
+        assert sketch.min == np.min(values).item()
+        for q in [0.01, 0.1, 0.2, 0.35, 0.5, 0.9, 0.99]:
+            expected = np.quantile(values, q, method='lower').item()
+            assert abs(sketch.quantile(q) - expected) <= 0.011 * abs(expected)
+    assert merged.count == 2 * len(values)
+
+
+def test_quantile_sketch_merge():
+    values = np.random.lognormal(-3, 1, 10000)
+    sketches = [QuantileSketch(0.02) for _ in range(4)]
+    for i, v in enumerate(values):
+        sketches[i % 4].add(v)
+    merged = sketches[0].copy()
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    assert merged.max == np.max(values).item()
+    expected = np.quantile(values, 0.99, method='lower').item()
+    assert abs(merged.quantile(0.99) - expected) <= 0.021 * expected
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(0.01))
+
+
+def test_quantile_sketch_collapse():
+    sketch = QuantileSketch(relative_accuracy=0.01, max_buckets=64)
+    for v in np.logspace(-6, 3, 1000):
+        sketch.add(v)
+    # noinspection PyProtectedMember
+    assert len(sketch._buckets) <= 64
+    assert sketch.count == 1000
+    assert abs(sketch.quantile(0.99) - 10 ** 2.91) <= 0.011 * 10 ** 2.91
+
+
+def test_profiler_tail():
+    clean()
+    times = np.random.lognormal(-3, 1, 1000)
+    for streaming in (True, False):
+        p = Profiler(f"p-{streaming}", streaming=streaming, relative_accuracy=0.005)
+        for t in times:
+            # noinspection PyProtectedMember
+            p._record(t)
+        assert p.min_time == np.min(times).item()
+        assert p.max_time == np.max(times).item()
+        expected = np.quantile(times, 0.9, method='lower').item()
+        assert abs(p.tail(90) - expected) <= 0.006 * expected
@@ -0,0 +1,73 @@
+import io
+import json
+import os
+from multiprocessing import Process
+
+import numpy as np
+import pytest
+
+from pyprof import Profiler, clean, report, snapshot, merge_snapshot, dump_snapshot, load_snapshot
+from .test_utils import close
+
+
+def _record_tree(times):
+    clean()
+    p1 = Profiler("p1", streaming=True)
+    p2 = Profiler("p2", p1)
+    for t in times:
+        # noinspection PyProtectedMember
+        p2._record(t)
+    # noinspection PyProtectedMember
+    p1._record(sum(times))
+
+
+def test_snapshot_merge():
+    times = np.abs(np.random.normal(0.1, 0.01, 100))
+    _record_tree(times)
+    data = json.loads(json.dumps(snapshot()))
+    assert "times" not in json.dumps(data)
+
+    clean()
+    merge_snapshot(data, data)
+    p1 = Profiler.get("/p1")
+    p2 = Profiler.get("/p1/p2")
+    assert p1.streaming and not p2.streaming
+    # p2 is recorded while p1 is not in tic
+    assert p1.count == 2 * (len(times) + 1)
+    assert p2.count == 2 * len(times)
+    assert close(p2.total, 2 * np.sum(times).item())
+    assert close(p2.average, np.mean(times).item())
+    assert close(p2.standard_deviation, np.std(times).item())
+    assert p2.min_time == np.min(times).item()
+    assert p2.max_time == np.max(times).item()
+    assert close(p2.tail(90), np.percentile(times, 90).item())
+    assert len(report().splitlines()) == 4
+
+    with pytest.raises(ValueError):
+        merge_snapshot({"version": -1})
+
+
+def _worker(times, path):
+    _record_tree(times)
+    dump_snapshot(path)
+
+
+def test_snapshot_files(tmp_path):
+    times = np.abs(np.random.normal(0.1, 0.01, 10))
+    workers = [Process(target=_worker, args=(times, tmp_path / f"{i}.json")) for i in range(4)]
+    for _ in workers:
+        _.start()
+    for _ in workers:
+        _.join()
+    clean()
+    load_snapshot(*sorted(tmp_path.glob("*.json")))
+    assert Profiler.get("/p1/p2").count == 4 * len(times)
+    assert sorted(os.listdir(tmp_path)) == [f"{i}.json" for i in range(4)]
+
+    _record_tree(times)
+    with io.StringIO() as f:
+        dump_snapshot(f)
+        f.seek(0)
+        clean()
+        load_snapshot(f)
+    assert Profiler.get("/p1/p2").count == len(times)
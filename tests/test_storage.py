@@ -0,0 +1,62 @@
+import numpy as np
+
+from pyprof import Profiler, QuantileSketch, clean
+from pyprof import sketch as sketch_module, statistics as statistics_module
+from pyprof.statistics import StreamingStatistics, SampleStatistics
+from .test_utils import close
+
+
+def test_vectorized_extend(monkeypatch):
+    values = np.random.lognormal(-3, 2, 5000)
+    values[:10] = 0.
+    vectorized_sketch, vectorized_statistics = QuantileSketch(max_buckets=256), StreamingStatistics()
+    vectorized_sketch.extend(values)
+    vectorized_statistics.extend(values.tolist())
+
+    monkeypatch.setattr(sketch_module, "np", None)
+    monkeypatch.setattr(statistics_module, "np", None)
+    sketch, statistics = QuantileSketch(max_buckets=256), StreamingStatistics()
+    sketch.extend(values.tolist())
+    statistics.extend(values.tolist())
+
+    assert vectorized_sketch.to_dict() == sketch.to_dict()
+    assert vectorized_statistics.count == statistics.count
+    assert close(vectorized_statistics.total, statistics.total)
+    assert close(vectorized_statistics.standard_deviation, statistics.standard_deviation)
+
+
+def test_sample_storage():
+    n = 100000
+    values = np.random.lognormal(-3, 1, n)
+    statistics = SampleStatistics()
+    for batch in np.split(values, 100):
+        statistics.extend(batch.tolist())
+    assert statistics.times.itemsize == 8
+    assert len(statistics.times) == n
+    assert close(statistics.average, np.mean(values).item())
+    assert close(statistics.standard_deviation, np.std(values, ddof=1).item())
+    assert np.array_equal(statistics.sorted_times, np.sort(values))
+
+    merged = SampleStatistics()
+    merged.merge(statistics)
+    merged.merge(statistics)
+    assert len(merged.times) == 2 * n
+    assert close(merged.average, statistics.average)
+
+
+def test_profiler_storage():
+    clean()
+    p = Profiler("storage")
+    for _ in range(3 * Profiler.buffer_size):
+        p.tic()
+        p.toc()
+    assert p.count == len(p.times) == 3 * Profiler.buffer_size
+    # a view of the times does not block merging more of them
+    times = np.asarray(p.times)
+    for _ in range(Profiler.buffer_size):
+        p.tic()
+        p.toc()
+    assert p.count == len(p.times) == 4 * Profiler.buffer_size
+    assert len(times) == 3 * Profiler.buffer_size
+    assert p.sorted_times[0] == p.min_time
+    assert p.sorted_times[-1] == p.max_time
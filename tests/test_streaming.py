@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from pyprof import profile, Profiler, clean, report
+from .test_utils import close
+
+
+# noinspection PyProtectedMember
+def test_streaming_statistics():
+    clean()
+    times = np.abs(np.random.normal(0.1, 0.01, 1000))
+    p = Profiler("p", streaming=True)
+    q = Profiler("q")
+    for t in times:
+        for _ in (p, q):
+            _._record(t)
+    assert p.streaming and not q.streaming
+    assert not hasattr(p._statistics, '_elapsed_times')
+    for _ in (p, q):
+        assert _.count == len(times)
+        assert close(_.total, np.sum(times).item())
+        assert close(_.average, np.mean(times).item())
+        assert close(_.standard_deviation, np.std(times).item())
+        assert _.min_time == np.min(times).item()
+        assert _.max_time == np.max(times).item()
+    with pytest.raises(RuntimeError):
+        _ = p.times
+    assert len(report().splitlines()) == 4
+
+
+def test_streaming_profile():
+    clean()
+    with profile("p", streaming=True):
+        for _ in range(10):
+            with profile("q"):
+                pass
+    assert Profiler.get("/p").streaming
+    assert not Profiler.get("/p/q").streaming
+    assert Profiler.get("/p/q").count == 10
+
+    Profiler.default_streaming = True
+    try:
+        with profile("r"):
+            pass
+    finally:
+        Profiler.default_streaming = False
+    assert Profiler.get("/r").streaming
+    assert Profiler.get("/r").count == 1
+
+
+def test_streaming_ancestors():
+    clean()
+    n = 3 * Profiler.buffer_size
+    for _ in range(n):
+        with profile("handler", streaming=True):
+            pass
+    p = Profiler("p")
+    q = Profiler("q", Profiler("streaming", p, streaming=True))
+    for _ in range(n):
+        q.tic()
+        q.toc()
+    # the root and the other ancestors of streaming Profilers, which are only filled by them, hold no elapsed time
+    for full_path in ("", "/p", "/p/streaming"):
+        ancestor = Profiler.get(full_path)
+        assert ancestor.count == (2 * n if full_path == "" else n)
+        # noinspection PyProtectedMember
+        assert len(getattr(ancestor._statistics, "_elapsed_times", ())) == 0
+    assert len(q.times) == n
@@ -0,0 +1,71 @@
+import io
+import json
+import time
+
+from pyprof import profile, clean, SpanRecorder, TraceLog, ProfiledThreadPoolExecutor, export_chrome_trace
+from pyprof.timeline import _iter_spans
+
+
+def _run():
+    def task():
+        with profile("task"):
+            time.sleep(1e-3)
+
+    with profile("pipeline"):
+        with ProfiledThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(8):
+                executor.submit(task)
+
+
+def test_chrome_trace():
+    clean()
+    with SpanRecorder() as recorder:
+        _run()
+    assert len(recorder) == 9
+    f = io.StringIO()
+    export_chrome_trace(f, recorder)
+    events = json.loads(f.getvalue())["traceEvents"]
+    spans = [_ for _ in events if _["ph"] == "X"]
+    assert sorted(_["args"]["path"] for _ in spans) == ["/pipeline"] + ["/pipeline/task"] * 8
+    pipeline, = [_ for _ in spans if _["name"] == "pipeline"]
+    for span in spans:
+        assert pipeline["ts"] <= span["ts"] and span["ts"] + span["dur"] <= pipeline["ts"] + pipeline["dur"]
+    task_threads = {_["tid"] for _ in spans if _["name"] == "task"}
+    assert pipeline["tid"] not in task_threads
+    thread_names = {_["tid"]: _["args"]["name"] for _ in events if _["ph"] == "M"}
+    assert set(thread_names) == task_threads | {pipeline["tid"]}
+
+
+def test_chrome_trace_bounded():
+    clean()
+    with SpanRecorder(max_spans=4) as recorder:
+        for _ in range(10):
+            with profile("p"):
+                pass
+    assert len(recorder) == 4
+
+
+# noinspection PyProtectedMember
+def test_chrome_trace_snapshot():
+    clean()
+    with SpanRecorder() as recorder:
+        with profile("before"):
+            pass
+        spans, _ = _iter_spans(recorder)
+        # recorded after the snapshot
+        with profile("after"):
+            pass
+    assert [_[0] for _ in spans] == ["/before"]
+    assert [_[:2] for _ in recorder.spans()] == [_[:2] for _ in _iter_spans(recorder)[0]]
+    assert all(abs(_[2] - time.time()) < 60 for _ in recorder.spans())
+
+
+def test_chrome_trace_from_trace_log(tmp_path):
+    clean()
+    with TraceLog(tmp_path / "trace.bin"):
+        _run()
+    export_chrome_trace(tmp_path / "trace.json", tmp_path / "trace.bin")
+    with open(tmp_path / "trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == 9
+    assert abs(events[0]["ts"] * 1e-6 - time.time()) < 60
@@ -0,0 +1,70 @@
+import time
+from threading import Thread, Barrier
+
+import numpy as np
+
+from pyprof import profile, Profiler, clean, TraceLog, read_trace, load_trace
+from .test_utils import close
+
+
+def test_trace(tmp_path):
+    clean()
+    file = tmp_path / "trace.bin"
+    n_threads = 4
+    barrier = Barrier(n_threads)
+
+    def f():
+        for _ in range(100):
+            with profile("r"):
+                pass
+        barrier.wait()
+
+    with TraceLog(file):
+        with profile("p"):
+            for _ in range(10):
+                with profile("q"):
+                    pass
+        threads = [Thread(target=f) for _ in range(n_threads)]
+        for _ in threads:
+            _.start()
+        for _ in threads:
+            _.join()
+    with profile("s"):  # not traced
+        pass
+
+    paths, records = read_trace(file)
+    assert sorted(paths) == ["/p", "/p/q", "/r"]
+    assert len(records) == 411
+    assert np.all(np.diff(records["seq"].astype(np.int64)) > 0)
+    assert abs(records["start"][0] - time.time()) < 60
+    q = records[records["path_id"] == paths.index("/p/q")]
+    assert close(np.sum(q["duration"]).item(), Profiler.get("/p/q").total)
+    assert np.all(q["flags"] == 0)
+    r = records[records["path_id"] == paths.index("/r")]
+    assert len(np.unique(r["thread_id"])) == n_threads
+    assert np.all(r["flags"] == 1)
+
+    expected = {
+        full_path: (Profiler.get(full_path).count, Profiler.get(full_path).total)
+        for full_path in ["/p", "/p/q", "/r"]
+    }
+    expected[""] = (Profiler.get("").count - 1, Profiler.get("").total - Profiler.get("/s").total)
+    clean()
+    load_trace(file)
+    for full_path, (count, total) in expected.items():
+        assert Profiler.get(full_path).count == count
+        assert close(Profiler.get(full_path).total, total)
+
+
+def test_trace_ring(tmp_path):
+    clean()
+    file = tmp_path / "trace.bin"
+    with TraceLog(file, capacity=16):
+        p = Profiler("p")
+        for i in range(100):
+            # noinspection PyProtectedMember
+            p._record(float(i))
+    paths, records = read_trace(file)
+    assert len(records) == 16
+    assert records["duration"].tolist() == [float(_) for _ in range(84, 100)]
+    assert records["seq"].tolist() == list(range(85, 101))
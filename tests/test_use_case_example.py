@@ -1,7 +1,7 @@
 """
 This file work as a show-case example, and it shows all public APIs and all common usages.
 """
-from pyprof import profile, Profiler, report
+from pyprof import profile, Profiler, report, ProfiledThreadPoolExecutor
 import time
 from concurrent.futures import ThreadPoolExecutor
 from tests.test_utils import close
@@ -31,6 +31,14 @@ def g():
             executor.submit(f)
 
 
+@profile('propagated-multi-thread')
+def k():
+    # `ProfiledThreadPoolExecutor` runs tasks under the Profiler current at submit time
+    with ProfiledThreadPoolExecutor() as executor:
+        for i in range(10):
+            executor.submit(f)
+
+
 def test_main():
     h()
     assert Profiler.get("/single-thread").count == 1
@@ -55,6 +63,11 @@ def test_main():
     assert close(Profiler.get("/f/sleep").average, 0.03)
     assert close(Profiler.get("/f/sleep").standard_deviation, 0.)
 
+    k()
+    assert Profiler.get("/propagated-multi-thread").count == 1
+    assert Profiler.get("/propagated-multi-thread/f").count == 10
+    assert close(Profiler.get("/propagated-multi-thread/f").average, 0.13)
+
     # print a formatted time usage report
     print(report())
     # filter components
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from pyprof import profile, Profiler, clean, report, RollingStatistics
+from .test_utils import close
+
+
+def test_rolling_statistics():
+    rolling = RollingStatistics(span=900, resolution=10)
+    # one tic-toc-pair per second for an hour, slower in the last 5 minutes
+    timestamps = np.arange(3600.)
+    elapsed_times = np.where(timestamps >= 3300, 0.2, 0.1)
+    data = np.stack([timestamps, elapsed_times], axis=-1).reshape(-1).tolist()
+    for i in range(0, len(data), 200):
+        rolling.extend(data[i:i + 200])
+    # noinspection PyProtectedMember
+    assert len(rolling._buckets) == 90
+    now = 3599.5
+    assert rolling.window(60, now).count == 60
+    assert close(rolling.window(60, now).average, 0.2)
+    assert rolling.window(600, now).count == 600
+    assert close(rolling.window(600, now).average, 0.15)
+    assert close(rolling.window(600, now).tail(99), 0.2)
+    assert close(rolling.window(600, now).tail(10), 0.1)
+    assert rolling.window(3600, now).count == 900
+    assert rolling.window(60, now + 120).count == 0
+    # the ongoing bucket has just started, so the window covers only the 5 buckets before it
+    assert rolling.window(60, 3600.).count == 50
+
+    # too old
+    rolling.extend([0., 1.])
+    assert rolling.window(3600, now).count == 900
+
+    with pytest.raises(ValueError):
+        RollingStatistics(span=10, resolution=60)
+
+
+def test_profiler_window():
+    clean()
+    for _ in range(10):
+        with profile("p", windowed=True):
+            with profile("q"):
+                pass
+    p = Profiler.get("/p")
+    assert p.windowed
+    assert p.window(60).count == 10
+    assert p.window(60).max_time == p.max_time
+    with pytest.raises(RuntimeError):
+        Profiler.get("/p/q").window(60)
+
+    rpt = report(windows=(60, 900))
+    assert "count@1m" in rpt.splitlines()[0]
+    assert "p99@15m" in rpt.splitlines()[0]
+    assert [_.split("|")[8].strip() for _ in rpt.splitlines()[1:]] == ["", "10", ""]